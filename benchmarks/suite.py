@@ -0,0 +1,342 @@
+"""
+Benchmark suite of the hot paths: routing, parameter formatting and
+binding, validation, resolution and execution overhead.
+
+    $ python benchmarks/suite.py                       # Run all benchmarks
+    $ python benchmarks/suite.py -k router             # Filter by name
+    $ python benchmarks/suite.py --save baseline.json
+    $ python benchmarks/suite.py --compare baseline.json
+
+With --compare, the timings are compared to the saved ones and the
+script exits with status 1 if a benchmark is slower than the baseline
+by more than the threshold (20% by default). Timings are the best of
+several repeats, so they are comparable between runs on the same
+machine only.
+
+The `*_linear_*` and `*_recursive_*` benchmarks replay previous
+implementations of the router and of the validation, as a reference
+for the current ones.
+"""
+
+import argparse
+import json
+import re
+import sys
+from timeit import Timer
+
+from interlinked import Workflow
+from interlinked.router import Match, Router
+from interlinked.workflow import CallPlan, Template, rformat
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """
+    Register a benchmark: the decorated function builds the fixtures
+    and returns the callable to measure.
+    """
+
+    def decorator(fn):
+        BENCHMARKS[name] = fn
+        return fn
+
+    return decorator
+
+
+def chain(name, size):
+    wkf = Workflow(name)
+
+    @wkf.provide("step_0")
+    def first(offset=0):
+        return offset
+
+    for i in range(1, size):
+
+        @wkf.depend(prev=f"step_{i - 1}")
+        @wkf.provide(f"step_{i}")
+        def step(prev, offset=0, scale=1):
+            return prev + scale
+
+    return wkf
+
+
+def fan_out(name, width):
+    wkf = Workflow(name)
+
+    @wkf.provide("source")
+    def source():
+        return 1
+
+    for i in range(width):
+
+        @wkf.depend(value="source")
+        @wkf.provide(f"leaf_{i}")
+        def leaf(value, scale=1):
+            return value * scale
+
+    @wkf.depend(**{f"leaf_{i}": f"leaf_{i}" for i in range(width)})
+    @wkf.provide("total")
+    def total(**leaves):
+        return sum(leaves.values())
+
+    return wkf
+
+
+def layered(name, layers, width):
+    wkf = Workflow(name)
+    for layer in range(layers):
+        for pos in range(width):
+            deps = {}
+            if layer:
+                deps = {
+                    "left": f"node_{layer - 1}_{pos}",
+                    "right": f"node_{layer - 1}_{(pos + 1) % width}",
+                }
+
+            @wkf.depend(**deps)
+            @wkf.provide(f"node_{layer}_{pos}")
+            def node(**kw):
+                return None
+
+    return wkf
+
+
+def routes(size):
+    router = Router()
+    for i in range(size):
+        router.add(f"resource_{i}.{{city}}.{{day:int}}", i)
+    return router
+
+
+for size in (10, 100, 1000, 5000):
+
+    @benchmark(f"router_match_{size}")
+    def router_match(size=size):
+        router = routes(size)
+        key = f"resource_{size - 1}.brussels.1"
+        return lambda: router.match(key)
+
+
+@benchmark("router_scan_1000")
+def router_scan():
+    router = routes(1000)
+    # Bypass the match cache
+    return lambda: router._match("resource_999.brussels.1")
+
+
+def linear_match(router, key):
+    """
+    Previous Router.match: one `regex.match` per route, in insertion
+    order
+    """
+    res = router.routes.get(key)
+    if res is not None:
+        return Match(key, res[1], {})
+    for route, (regex, value) in router.routes.items():
+        m = regex.match(key)
+        if m:
+            return Match(route, value, m.groupdict())
+    return None
+
+
+@benchmark("router_linear_1000")
+def router_linear():
+    router = routes(1000)
+    return lambda: linear_match(router, "resource_999.brussels.1")
+
+
+@benchmark("router_match_miss_1000")
+def router_match_miss():
+    router = routes(1000)
+    return lambda: router.match("unknown.brussels.1")
+
+
+@benchmark("run_chain_1000")
+def run_chain():
+    wkf = chain("bench-suite-chain", 1000)
+    return lambda: wkf.run("step_999")
+
+
+@benchmark("run_plan_chain_1000")
+def run_plan_chain():
+    plan = chain("bench-suite-plan", 1000).plan("step_999")
+    return lambda: plan.run()
+
+
+@benchmark("run_fan_out_500")
+def run_fan_out():
+    wkf = fan_out("bench-suite-fan-out", 500)
+    return lambda: wkf.run("total")
+
+
+@benchmark("run_multi_pattern")
+def run_multi_pattern():
+    wkf = Workflow("bench-suite-multi")
+
+    @wkf.provide("low.{name}", "up.{name}", "title.{name}")
+    def variants(name):
+        return name.lower(), name.upper(), name.title()
+
+    @wkf.depend(low="low.{name}", up="up.{name}", title="title.{name}")
+    @wkf.provide("all.{name}")
+    def join(low, up, title):
+        return low + up + title
+
+    names = [f"all.name_{i}" for i in range(100)]
+    return lambda: wkf.run_many(names)
+
+
+def config_entry():
+    return {
+        f"key_{i}": {"path": "{root}/{name}/" + str(i), "values": ["{name}", i]}
+        for i in range(100)
+    }
+
+
+@benchmark("rformat_config")
+def rformat_config():
+    config = config_entry()
+    return lambda: rformat(config, root="/data", name="ham")
+
+
+@benchmark("template_fmt")
+def template_fmt():
+    template = Template(config_entry())
+    kw = {"root": "/data", "name": "ham"}
+    # Bypass the memoization of Template.fmt to measure the formatting
+    return lambda: template._fmt(template.parsed, kw)
+
+
+@benchmark("bind_call_plan")
+def bind_call_plan():
+    def fn(a, b, c=1, *, d=2):
+        return a
+
+    plan = CallPlan(fn)
+    kw = {"a": 1, "b": 2, "d": 3, **{f"extra_{i}": i for i in range(20)}}
+    return lambda: plan(kw)
+
+
+@benchmark("validate_100x100")
+def validate():
+    wkf = layered("bench-suite-validate", 100, 100)
+
+    def run():
+        wkf._graph = None
+        wkf.validate()
+
+    return run
+
+
+@benchmark("validate_cached_100x100")
+def validate_cached():
+    wkf = layered("bench-suite-validate-cached", 100, 100)
+    return wkf.validate
+
+
+def recursive_validate(deps):
+    """
+    Previous Workflow.validate: one DFS per path from the roots, which
+    is exponential in the number of layers
+    """
+
+    def visit(parent, ancestors):
+        for child in deps[parent]:
+            assert child not in ancestors
+            visit(child, ancestors + (child,))
+
+    roots = set(deps) - set(c for children in deps.values() for c in children)
+    for root in roots:
+        visit(root, tuple())
+
+
+@benchmark("validate_recursive_12x10")
+def validate_recursive():
+    deps = layered("bench-suite-validate-recursive", 12, 10).deps()
+    return lambda: recursive_validate(deps)
+
+
+@benchmark("clone_kw_churn")
+def clone_kw_churn():
+    wkf = chain("bench-suite-clone", 50)
+
+    def run():
+        for i in range(20):
+            wkf.kw(offset=i).run("step_49")
+
+    return run
+
+
+def measure(fn, min_time=0.2, repeat=5):
+    """
+    Return the best time per call (in seconds) of fn, each repeat
+    lasts about min_time.
+    """
+    timer = Timer(fn)
+    once = timer.timeit(number=1)
+    number = max(1, int(min_time / max(once, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def compare(results, baseline, threshold):
+    """
+    Print results against baseline, return the names of the regressions
+    """
+    regressions = []
+    print(f"{'benchmark':<28} {'time (us)':>12} {'baseline (us)':>14} {'change':>8}")
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<28} {value * 1e6:>12.2f} {'-':>14} {'-':>8}")
+            continue
+        change = value / base - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = " !"
+        print(
+            f"{name:<28} {value * 1e6:>12.2f} {base * 1e6:>14.2f} "
+            f"{change:>+8.1%}{flag}"
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument("-k", "--filter", help="Regex on benchmark names")
+    parser.add_argument("--save", metavar="PATH", help="Save timings as baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare with baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Allowed slow down ratio"
+    )
+    parser.add_argument(
+        "--min-time", type=float, default=0.2, help="Time per repeat (seconds)"
+    )
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, build in BENCHMARKS.items():
+        if args.filter and not re.search(args.filter, name):
+            continue
+        fn = build()
+        fn()  # Warm up caches
+        results[name] = measure(fn, args.min_time)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
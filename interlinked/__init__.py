@@ -1,7 +1,29 @@
-import importlib.metadata
+from importlib import import_module
 
-from .router import Router  # noqa [F401]
-from .workflow import provide, depend, run, default_workflow, Workflow  # noqa [F401]
+# Attributes loaded on first access, so that importing a submodule (or
+# the cli) does not load everything
+_LAZY = {
+    "Router": "router",
+    "provide": "workflow",
+    "depend": "workflow",
+    "run": "workflow",
+    "default_workflow": "workflow",
+    "Workflow": "workflow",
+}
 
+__all__ = [*_LAZY, "__version__"]
 
-__version__ = importlib.metadata.version(__name__)
+
+def __getattr__(name: str):
+    if name == "__version__":
+        import importlib.metadata
+
+        return importlib.metadata.version(__name__)
+    if name in _LAZY:
+        module = import_module(f".{_LAZY[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted([*globals(), *_LAZY, "__version__"])
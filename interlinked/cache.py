@@ -0,0 +1,430 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from io import BytesIO
+from hashlib import sha256
+from operator import itemgetter
+from pathlib import Path
+from time import monotonic
+from types import CodeType
+from typing import Any, Callable, Hashable, Optional
+import logging
+import os
+import pickle
+import threading
+
+logger = logging.getLogger("interlinked")
+
+MISSING = object()
+
+
+def code_digest(fn: Callable) -> str:
+    """
+    Return a digest of the code of fn and of its default values. Line
+    numbers and file names are ignored, so moving a function around
+    does not change its digest.
+    """
+    code = getattr(fn, "__code__", None)
+    if code is None:
+        name = f"{getattr(fn, '__module__', '')}.{getattr(fn, '__qualname__', fn)}"
+        return sha256(name.encode()).hexdigest()
+
+    digest = sha256()
+
+    def update(code):
+        digest.update(code.co_code)
+        digest.update(repr((code.co_names, code.co_varnames)).encode())
+        for const in code.co_consts:
+            if isinstance(const, CodeType):
+                update(const)
+            elif isinstance(const, frozenset):
+                digest.update(repr(sorted(const, key=repr)).encode())
+            else:
+                digest.update(repr(const).encode())
+
+    update(code)
+    # Defaults not overridden by the run are not part of the parameters
+    kwdefaults = sorted((getattr(fn, "__kwdefaults__", None) or {}).items())
+    digest.update(repr((getattr(fn, "__defaults__", None), kwdefaults)).encode())
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class Upstream:
+    """
+    Stands for the result of a dependency in the parameters of a cache
+    key: the result is identified by its own key, instead of being
+    pickled.
+    """
+
+    resource_name: str
+    key: Hashable
+
+
+class KeyPickler(pickle.Pickler):
+    """
+    Pickle sets and frozensets in sorted order, so that their pickled
+    bytes do not depend on the hash of their items (randomized per
+    process for strings).
+    """
+
+    def persistent_id(self, obj):
+        if type(obj) in (set, frozenset):
+            return type(obj).__name__, sorted(obj, key=sort_key)
+        return None
+
+
+def sort_key(value: Any) -> str:
+    if type(value) in (set, frozenset):
+        return repr(sorted(value, key=sort_key))
+    return repr(value)
+
+
+def entry_key(resource_name: str, fn: Callable, kw: dict) -> Optional[str]:
+    """
+    Compute the key of a cache entry, returns None if the parameters can
+    not be pickled. Keys are stable across processes, but dicts with
+    the same items in a different order give different keys.
+    """
+    buffer = BytesIO()
+    try:
+        payload = (resource_name, code_digest(fn), sorted(kw.items()))
+        KeyPickler(buffer).dump(payload)
+    except Exception:
+        logger.debug(f"Parameters of {resource_name} can not be pickled")
+        return None
+    return sha256(buffer.getvalue()).hexdigest()
+
+
+class DiskCache:
+    """
+    Persist cell results across runs. Each result is pickled in its own
+    file, named after the digest of the resource name, the function
+    code and the parameters used for the call. When the size of the
+    directory exceeds `max_bytes`, the least recently used entries are
+    removed.
+    """
+
+    def __init__(self, path: str | os.PathLike, max_bytes: Optional[int] = None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+    def key(self, resource_name: str, fn: Callable, kw: dict) -> Optional[str]:
+        return entry_key(resource_name, fn, kw)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        path = self.path / f"{key}.pkl"
+        try:
+            with open(path, "rb") as fh:
+                value = pickle.load(fh)
+        except FileNotFoundError:
+            return default
+        except Exception:
+            # Corrupted entry, or a class that can not be imported anymore
+            logger.debug(f"Entry {key} can not be unpickled")
+            return default
+        # Mark entry as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process meanwhile
+            pass
+        return value
+
+    def set(self, key: str, value: Any):
+        try:
+            payload = pickle.dumps(value)
+        except Exception:
+            logger.debug(f"Value of entry {key} can not be pickled")
+            return
+        path = self.path / f"{key}.pkl"
+        tmp_path = self.path / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(payload)
+        os.replace(tmp_path, path)
+        if self.max_bytes is not None:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries until the total size of the
+        cache is below `max_bytes`.
+        """
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.path):
+                if not entry.name.endswith(".pkl"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def remove(self, key: str):
+        (self.path / f"{key}.pkl").unlink(missing_ok=True)
+
+    def clear(self):
+        for path in self.path.glob("*.pkl"):
+            path.unlink(missing_ok=True)
+
+    def __contains__(self, key: str):
+        return (self.path / f"{key}.pkl").exists()
+
+
+class MemoryCache:
+    """
+    In-memory version of DiskCache, keeping the `max_entries` most
+    recently used results. Values are not copied, so they are shared by
+    all the runs reading them.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, resource_name: str, fn: Callable, kw: dict) -> Optional[str]:
+        return entry_key(resource_name, fn, kw)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self.lock:
+            if key not in self.entries:
+                return default
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def set(self, key: str, value: Any):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def remove(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __contains__(self, key: str):
+        return key in self.entries
+
+
+class TTLCache:
+    """
+    In-memory cache of the results of a cell (see the `ttl`,
+    `max_entries` and `stale` options of `Workflow.provide`), shared by
+    all the runs of a workflow. Results expire `ttl` seconds after being
+    computed (never if ttl is None), at most `max_entries` are kept (the
+    least recently used are dropped first). Expired results are still
+    served during `stale` seconds, while being refreshed in the
+    background.
+    """
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        max_entries: int = 1024,
+        stale: float = 0,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stale = stale
+        self.clock = clock
+        # {(resource name, digest): (value, expiry time)}
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Keys being refreshed in the background
+        self.refreshing = set()
+
+    def key(self, resource_name: str, fn: Callable, kw: dict) -> Optional[tuple]:
+        digest = entry_key(resource_name, fn, kw)
+        if digest is None:
+            return None
+        return resource_name, digest
+
+    def lookup(self, key: tuple) -> tuple[Any, bool]:
+        """
+        Return the cached value (MISSING if not found or expired) and
+        True if the value is stale and has to be refreshed.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING, False
+            value, expiry = entry
+            now = self.clock()
+            if expiry is not None and now >= expiry:
+                if now >= expiry + self.stale:
+                    del self.entries[key]
+                    return MISSING, False
+                return value, True
+            self.entries.move_to_end(key)
+            return value, False
+
+    def get(self, key: tuple, default: Any = None) -> Any:
+        value, _ = self.lookup(key)
+        return default if value is MISSING else value
+
+    def set(self, key: tuple, value: Any):
+        expiry = None if self.ttl is None else self.clock() + self.ttl
+        with self.lock:
+            self.entries[key] = (value, expiry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def refresh(self, key: tuple, compute: Callable[[], Any]):
+        """
+        Compute a new value for key in a background thread, unless a
+        refresh of key is already running. Errors are logged, the stale
+        value is kept until it expires.
+        """
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def target():
+            try:
+                self.set(key, compute())
+            except Exception:
+                logger.exception(f"Refresh of {key[0]} failed")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+        threading.Thread(target=target, daemon=True).start()
+
+    def remove(self, key: tuple):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate(self, match: Callable[[str], Any]) -> int:
+        """
+        Drop the entries whose resource name satisfies match, return
+        their number
+        """
+        with self.lock:
+            keys = [key for key in self.entries if match(key[0])]
+            for key in keys:
+                del self.entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __contains__(self, key: tuple):
+        return self.lookup(key)[0] is not MISSING
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls: the first caller of a key
+    executes the call, callers arriving while it is in flight wait for
+    it and share its result (or its exception). Nothing is kept once
+    the call is done.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # {key: Future of the call in flight}
+        self.calls = {}
+        # Number of calls served by the flight of another caller
+        self.shared = 0
+
+    def key(self, resource_name: str, fn: Callable, kw: dict) -> Optional[tuple]:
+        """
+        Key of a cell call. Unhashable parameters (like the results of
+        dependencies) are identified by their id: calls only coalesce
+        if they received the same objects.
+        """
+        items = []
+        for name, value in sorted(kw.items(), key=itemgetter(0)):
+            try:
+                hash(value)
+            except TypeError:
+                value = (MISSING, id(value))
+            items.append((name, value))
+        return resource_name, fn, tuple(items)
+
+    def join(self, key: Hashable) -> tuple[bool, Future]:
+        """
+        Return (True, future) if the caller has to execute the call and
+        set the future, (False, future) if the call is in flight.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return False, future
+            future = self.calls[key] = Future()
+            return True, future
+
+    def land(self, key: Hashable, future: Future, res: Any = None, exc=None):
+        with self.lock:
+            del self.calls[key]
+        if exc is None:
+            future.set_result(res)
+        else:
+            future.set_exception(exc)
+
+    def do(
+        self, key: Hashable, fn: Callable, *args, wait: Optional[Callable] = None
+    ) -> Any:
+        """
+        Call fn(*args), or wait for the call of key in flight: with
+        `wait(future)` if given (to bound the wait), `future.result()`
+        otherwise.
+        """
+        leader, future = self.join(key)
+        if not leader:
+            return future.result() if wait is None else wait(future)
+        try:
+            res = fn(*args)
+        except BaseException as exc:
+            self.land(key, future, exc=exc)
+            raise
+        self.land(key, future, res)
+        return res
+
+    async def ado(
+        self, key: Hashable, fn: Callable, *args, wait: Optional[Callable] = None
+    ) -> Any:
+        """
+        Asynchronous version of do, fn and wait are coroutine functions
+        """
+        leader, future = self.join(key)
+        if not leader:
+            if wait is not None:
+                return await wait(future)
+            import asyncio
+
+            return await asyncio.wrap_future(future)
+        try:
+            res = await fn(*args)
+        except BaseException as exc:
+            self.land(key, future, exc=exc)
+            raise
+        self.land(key, future, res)
+        return res
@@ -1,34 +1,69 @@
 import argparse
 import logging
 import json
-from importlib.machinery import SourceFileLoader
 
 from .exceptions import InterlinkedException
-from .workflow import Workflow
-
-try:
-    import rich
-    from rich.tree import Tree
-except ImportError:
-    rich = None
-
-from interlinked import default_workflow, __version__
+from .loader import cached_metadata, load_source
+from .profile import Profiler
+from .workflow import Workflow, default_workflow
 
 
 fmt = "%(levelname)s:%(asctime).19s: %(message)s"
-logging.basicConfig(format=fmt)
 logger = logging.getLogger("interlinked")
 
 
 def run_cmd(args):
+    if args.connect:
+        return run_remote(args)
     wkf = find_workflow(args)
 
     config = load_conf(args.config)
+    if config:
+        wkf = wkf.config(config)
+
+    if args.dry_run:
+        print(wkf.plan(*args.targets).explain())
+        return
+
+    profiler = None
+    if args.profile:
+        profiler = Profiler()
+        wkf = wkf.clone()
+        wkf.add_hook(profiler)
+
+    executor = None
+    if args.processes:
+        from .process import ProcessPool
+
+        executor = ProcessPool(args.source.split(":", 1)[0], args.processes)
+
+    try:
+        for target in args.targets:
+            res = wkf.run(target, _executor=executor)
+            if args.show:
+                print(res)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    if profiler:
+        print(profiler.report())
 
-    for target in args.targets:
-        res = wkf.config(config).run(target)
-        if args.show:
-            print(res)
+
+def run_remote(args):
+    from .serve import Client
+
+    client = Client(args.connect)
+    results = client.run_many(args.targets, config=load_conf(args.config))
+    if args.show:
+        for target in args.targets:
+            print(results[target])
+
+
+def serve_cmd(args):
+    from .serve import serve
+
+    serve(find_workflow(args), args.address, args.max_entries)
 
 
 def load_conf(path):
@@ -50,26 +85,46 @@ def find_workflow(args):
     wkf_variable = None
     if ":" in src:
         src, wkf_variable = src.split(":", 1)
-        assert isinstance(wkf_variable, Workflow)
 
-    src = src.replace(".", "/")
-
-    loader = SourceFileLoader(args.source, f"{src}.py")
-    module = loader.load_module()
+    module = load_source(src)
     if not wkf_variable:
         return default_workflow
 
-    return getattr(module, wkf_variable)
+    wkf = getattr(module, wkf_variable)
+    assert isinstance(wkf, Workflow)
+    return wkf
+
+
+def metadata(args):
+    """
+    Return the dependencies and the validation error (if any) of the
+    workflow, reused from the cache directory if given.
+    """
+
+    def compute():
+        wkf = find_workflow(args)
+        try:
+            wkf.validate()
+        except InterlinkedException as e:
+            return {"deps": None, "error": str(e)}
+        return {"deps": wkf.deps(), "error": None}
+
+    return cached_metadata(args.cache, args.source, compute)
 
 
 def deps(args):
-    if rich is None:
+    try:
+        import rich
+        from rich.tree import Tree
+    except ImportError:
         msg = "Please install rich to display dependencies"
         exit(msg)
 
     # Instanciate child->parent dict
-    wkf = find_workflow(args)
-    deps = wkf.deps()
+    meta = metadata(args)
+    if meta["error"]:
+        exit("Error: " + meta["error"])
+    deps = meta["deps"]
 
     # Find roots aka items without parents
     roots = set(deps) - set(p for c in deps for p in deps[c])
@@ -87,14 +142,18 @@ def deps(args):
 
 
 def validate(args):
-    wkf = find_workflow(args)
-    try:
-        wkf.validate()
-    except InterlinkedException as e:
-        exit("Error: " + str(e))
+    error = metadata(args)["error"]
+    if error:
+        exit("Error: " + error)
     print("ok")
 
 
+def version(args):
+    from interlinked import __version__
+
+    print(__version__)
+
+
 def main():
     parser = argparse.ArgumentParser(
         prog="interlinked",
@@ -108,13 +167,19 @@ def main():
     parser.add_argument(
         "-v", "--verbose", action="count", default=0, help="Increase verbosity"
     )
+    parser.add_argument(
+        "--cache",
+        metavar="DIR",
+        help="Reuse workflow dependencies and validation stored in DIR while "
+        "the source file is unchanged",
+    )
     subparsers = parser.add_subparsers(dest="command")
 
     parser_deps = subparsers.add_parser("deps", description="Show dependencies")
     parser_deps.set_defaults(func=deps)
 
     parser_version = subparsers.add_parser("version", description="Print version")
-    parser_version.set_defaults(func=lambda a: print(__version__))
+    parser_version.set_defaults(func=version)
 
     parser_validate = subparsers.add_parser("validate", description="Validate Workflow")
     parser_validate.add_argument(
@@ -128,10 +193,55 @@ def main():
     parser_run = subparsers.add_parser("run", description="Print run")
     parser_run.add_argument("-s", "--show", action="store_true", help="Show output")
     parser_run.add_argument("-c", "--config", help="Load parameters from config")
+    parser_run.add_argument(
+        "-p", "--profile", action="store_true", help="Print execution profile"
+    )
+    parser_run.add_argument(
+        "-j", "--processes", type=int, help="Execute cells in worker processes"
+    )
+    parser_run.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="Print the execution plan without running it",
+    )
+    parser_run.add_argument(
+        "--connect",
+        metavar="ADDRESS",
+        help="Send the run to a server started with the serve command",
+    )
     parser_run.add_argument("targets", nargs="*", help="Run given targets")
     parser_run.set_defaults(func=run_cmd)
 
+    parser_serve = subparsers.add_parser(
+        "serve", description="Serve run requests over http"
+    )
+    parser_serve.add_argument(
+        "-a",
+        "--address",
+        default="8765",
+        help="Unix socket path, 'host:port' or port on localhost (default: 8765)",
+    )
+    parser_serve.add_argument(
+        "--max-entries",
+        type=int,
+        default=1024,
+        help="Number of results kept in memory between runs",
+    )
+    parser_serve.set_defaults(func=serve_cmd)
+
     args = parser.parse_args()
+    if args.command == "run" and args.connect:
+        # Remote runs only support the targets, the config and --show
+        local = {
+            "--profile": args.profile,
+            "--dry-run": args.dry_run,
+            "--processes": args.processes,
+        }
+        options = [option for option, value in local.items() if value]
+        if options:
+            parser_run.error(f"{', '.join(options)} can not be used with --connect")
+    logging.basicConfig(format=fmt)
 
     if args.verbose == 1:
         logger.setLevel("INFO")
@@ -15,3 +15,23 @@ class UnknownDependency(InterlinkedException):
 
 class InvalidValue(InterlinkedException):
     pass
+
+
+class RemoteError(InterlinkedException):
+    pass
+
+
+class CellTimeout(InterlinkedException, TimeoutError):
+    pass
+
+
+class RunCancelled(InterlinkedException):
+    pass
+
+
+class RunTimeout(RunCancelled, TimeoutError):
+    pass
+
+
+class StreamConsumed(InterlinkedException):
+    pass
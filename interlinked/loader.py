@@ -0,0 +1,65 @@
+from hashlib import sha256
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+from types import ModuleType
+from typing import Callable, Optional
+import json
+import os
+import sys
+
+
+def source_path(source: str) -> str:
+    """
+    Path of a workflow module given as a python file or as a dotted
+    path relative to the current directory ('folder.file').
+    """
+    if source.endswith(".py"):
+        return source
+    return source.replace(".", "/") + ".py"
+
+
+def load_source(source: str) -> ModuleType:
+    """
+    Import the workflow module designated by source
+    """
+    path = source_path(source)
+    # Namespaced, so that a source file named after another module
+    # (json.py, logging.py, ...) does not replace it. The name only
+    # depends on the path, so objects defined in the source can be
+    # pickled between processes loading it.
+    digest = sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    name = f"interlinked.loaded.{digest}"
+    spec = spec_from_file_location(name, path)
+    module = module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def cached_metadata(cache_dir: Optional[str], source: str, compute: Callable) -> dict:
+    """
+    Return the metadata of a workflow source (as computed by `compute`)
+    from the cache directory if the content of the source file did not
+    change, call compute and save its result otherwise. Modules imported
+    by the source file are not checked.
+    """
+    if cache_dir is None:
+        return compute()
+
+    path = source_path(source.split(":", 1)[0])
+    digest = sha256(Path(path).read_bytes()).hexdigest()
+    key = sha256(f"{os.path.abspath(path)}:{source}".encode()).hexdigest()
+    cache_path = Path(cache_dir) / f"{key}.json"
+    try:
+        entry = json.loads(cache_path.read_text())
+    except (FileNotFoundError, ValueError):
+        entry = None
+    if entry and entry["digest"] == digest:
+        return entry["metadata"]
+
+    metadata = compute()
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps({"digest": digest, "metadata": metadata}))
+    os.replace(tmp_path, cache_path)
+    return metadata
@@ -0,0 +1,183 @@
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Optional
+import os
+import sys
+
+from interlinked.exceptions import CellTimeout
+from interlinked.loader import load_source
+
+# Values smaller than this are pickled, larger ones are copied in
+# shared memory
+MIN_SHARED_BYTES = 2**20
+
+
+class ProcessPool(Executor):
+    """
+    Executor calling cell functions in worker processes. Each worker
+    loads the `source` module once, cells are then found by workflow
+    name and route, so they must be defined when this module is
+    loaded. Steps are scheduled by threads of the current process, that
+    wait for the workers. Large inputs and results (bytes and numpy
+    arrays) are transferred through shared memory instead of being
+    pickled.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        max_workers: Optional[int] = None,
+        min_shared_bytes: int = MIN_SHARED_BYTES,
+        mp_context=None,
+    ):
+        self.source = source
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_shared_bytes = min_shared_bytes
+        # Spawn workers, forked ones would inherit the workflows already
+        # loaded by the current process
+        self.processes = ProcessPoolExecutor(
+            self.max_workers,
+            mp_context=mp_context or get_context("spawn"),
+            initializer=load_source,
+            initargs=(source,),
+        )
+        self.threads = ThreadPoolExecutor(self.max_workers)
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        return self.threads.submit(fn, *args, **kwargs)
+
+    def call(self, wkf, route: str, kw: dict, timeout: Optional[float] = None) -> Any:
+        """
+        Call the function of the cell matching route in a worker and
+        return its result. Raises CellTimeout if the result is not
+        available after timeout seconds (the worker is not stopped).
+        """
+        kw = {key: send(value, self.min_shared_bytes) for key, value in kw.items()}
+        try:
+            future = self.processes.submit(
+                call_cell, wkf.name, route, kw, self.min_shared_bytes
+            )
+        except BaseException:
+            release(kw.values())
+            raise
+        # Calls cancelled before starting never receive their inputs
+        future.add_done_callback(partial(release_cancelled, kw))
+        done, _ = wait([future], timeout)
+        if not done:
+            if not future.cancel():
+                # The result is still sent by the worker
+                future.add_done_callback(discard)
+            raise CellTimeout(f"Call of {route} exceeded {timeout:.2f}s")
+        return receive(future.result())
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        self.threads.shutdown(wait, cancel_futures=cancel_futures)
+        self.processes.shutdown(wait, cancel_futures=cancel_futures)
+
+
+@dataclass
+class Shared:
+    """
+    Reference to a value copied in shared memory
+    """
+
+    name: str
+    size: int
+    # None for bytes, (shape, dtype) for numpy arrays
+    array: Optional[tuple] = None
+
+
+def call_cell(wkf_name: str, route: str, kw: dict, min_shared_bytes: int) -> Any:
+    """
+    Executed in the workers
+    """
+    from interlinked.workflow import Workflow
+
+    kw = {key: receive(value) for key, value in kw.items()}
+    wkf = Workflow.get(wkf_name)
+    if wkf is None:
+        raise KeyError(f"Workflow {wkf_name} not found in worker")
+    _, cell = wkf.router.routes[route]
+    return send(cell.fn(**kw), min_shared_bytes)
+
+
+def send(value: Any, min_shared_bytes: int) -> Any:
+    """
+    Copy large bytes or numpy arrays in shared memory and return a
+    reference to it, other values are returned as-is.
+    """
+    numpy = sys.modules.get("numpy")
+    if isinstance(value, bytes):
+        data, array = value, None
+    elif numpy is not None and isinstance(value, numpy.ndarray) and not value.hasobject:
+        data = numpy.ascontiguousarray(value)
+        array = (value.shape, value.dtype.str)
+    else:
+        return value
+    size = len(data) if array is None else data.nbytes
+    if size < min_shared_bytes:
+        return value
+
+    shm = SharedMemory(create=True, size=size)
+    shm.buf[:size] = data if array is None else data.reshape(-1).view("B")
+    shm.close()
+    # The segment is unlinked by the receiving process. Workers share
+    # the resource tracker of the pool, so it is not reported as leaked
+    # when the sending process exits.
+    return Shared(shm.name, size, array)
+
+
+def receive(value: Any) -> Any:
+    """
+    Read back values returned by send
+    """
+    if not isinstance(value, Shared):
+        return value
+    shm = SharedMemory(value.name)
+    if value.array is None:
+        data = bytes(shm.buf[: value.size])
+        shm.close()
+        shm.unlink()
+        return data
+
+    import numpy
+
+    shape, dtype = value.array
+    res = numpy.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    shm.close()
+    shm.unlink()
+    return res
+
+
+def release(values) -> None:
+    """
+    Unlink the shared memory of values that will not be received
+    """
+    for value in values:
+        receive(value)
+
+
+def release_cancelled(kw: dict, future: Future) -> None:
+    """
+    Done-callback releasing the inputs of a cancelled call
+    """
+    if future.cancelled():
+        release(kw.values())
+
+
+def discard(future: Future) -> None:
+    """
+    Done-callback releasing the result of a call that is no longer
+    awaited
+    """
+    if not future.cancelled() and future.exception() is None:
+        receive(future.result())
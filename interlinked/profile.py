@@ -0,0 +1,136 @@
+from dataclasses import dataclass, field
+from typing import Any, Optional
+import sys
+import threading
+
+
+def size_of(value: Any) -> int:
+    """
+    Approximate size of a value in bytes: the `nbytes` attribute (numpy
+    arrays, pandas series, ...) if present, the shallow size otherwise.
+    """
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    return sys.getsizeof(value)
+
+
+@dataclass
+class Record:
+    """
+    Measures of the resolution of one resource in a run. Times are in
+    seconds: wall and cpu time of the cell execution, and overhead of
+    the resource preparation (routing, config formatting, ...).
+    """
+
+    resource_name: str
+    dependencies: dict = field(default_factory=dict)
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    overhead: float = 0.0
+    # Number of times the result was read from the run cache
+    hits: int = 0
+    # True if the result was read from the workflow persistent cache
+    cached: bool = False
+    size: Optional[int] = None
+    error: Optional[BaseException] = None
+
+
+class Hook:
+    """
+    Base class of run hooks, see `Workflow.add_hook`. Methods are
+    called from the thread executing the cell.
+    """
+
+    def on_start(self, run, step):
+        pass
+
+    def on_end(self, run, step, record: Record):
+        pass
+
+    def on_error(self, run, step, exc: BaseException):
+        pass
+
+
+class Profiler(Hook):
+    """
+    Collect the records of all the cells executed by the runs of a
+    workflow.
+    """
+
+    def __init__(self):
+        self.records = []
+        # Largest size of the results held by a run, in bytes
+        self.peak_memory = 0
+        self.lock = threading.Lock()
+
+    def on_end(self, run, step, record):
+        with self.lock:
+            self.records.append(record)
+            # The result of the cell is not yet stored in the run
+            memory = run.memory + (record.size or 0)
+            self.peak_memory = max(self.peak_memory, memory, run.peak_memory)
+
+    def on_error(self, run, step, exc):
+        with self.lock:
+            self.records.append(run.records[step.resource_name])
+
+    def critical_path(self) -> tuple[float, list[str]]:
+        """
+        Return the longest chain of dependent resources (based on wall
+        time) and its total duration.
+        """
+        by_name = {record.resource_name: record for record in self.records}
+        # {name: (duration of the longest chain ending at name, previous)}
+        best = {}
+        for name in by_name:
+            stack = [name]
+            while stack:
+                node = stack[-1]
+                if node in best:
+                    stack.pop()
+                    continue
+                deps = [d for d in by_name[node].dependencies.values() if d in by_name]
+                todo = [d for d in deps if d not in best]
+                if todo:
+                    stack.extend(todo)
+                    continue
+                stack.pop()
+                duration, prev = max(((best[d][0], d) for d in deps), default=(0, None))
+                best[node] = (duration + by_name[node].wall_time, prev)
+
+        if not best:
+            return 0, []
+        node = max(best, key=lambda n: best[n][0])
+        total = best[node][0]
+        path = []
+        while node is not None:
+            path.append(node)
+            node = best[node][1]
+        return total, path[::-1]
+
+    def report(self) -> str:
+        """
+        Return a table of the records, sorted by wall time, followed by
+        the critical path.
+        """
+        header = (
+            f"{'resource':<40} {'wall (ms)':>10} {'cpu (ms)':>10} "
+            f"{'overhead (ms)':>14} {'hits':>5} {'cached':>7} {'size':>10}"
+        )
+        lines = [header]
+        for record in sorted(self.records, key=lambda r: -r.wall_time):
+            name = record.resource_name
+            if record.error is not None:
+                name += " (failed)"
+            lines.append(
+                f"{name:<40} {record.wall_time * 1e3:>10.3f} "
+                f"{record.cpu_time * 1e3:>10.3f} {record.overhead * 1e3:>14.3f} "
+                f"{record.hits:>5} {'yes' if record.cached else 'no':>7} "
+                f"{'-' if record.size is None else record.size:>10}"
+            )
+        total, path = self.critical_path()
+        lines.append("")
+        lines.append(f"Critical path ({total * 1e3:.3f} ms): " + " -> ".join(path))
+        lines.append(f"Peak memory: {self.peak_memory} bytes")
+        return "\n".join(lines)
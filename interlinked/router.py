@@ -1,5 +1,7 @@
 from dataclasses import dataclass
-from typing import Optional, Any
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, Optional
 from collections import defaultdict
 import re
 
@@ -30,29 +32,152 @@ VALUE_PATTERNS = {
 PARAM_REGEX = re.compile("{(" + ID_PATTERN + ")}", re.I)
 
 
-@dataclass
+@dataclass(frozen=True)
 class Match:
+    """
+    Result of Router.match. Matches are cached and shared by the
+    callers, so they can not be modified (kw is a read-only mapping).
+    """
+
     route: str
     value: Any
-    kw: dict
+    kw: Mapping[str, str]
+
+    def __post_init__(self):
+        if not isinstance(self.kw, MappingProxyType):
+            object.__setattr__(self, "kw", MappingProxyType(dict(self.kw)))
+
+
+def route_regex(path: str) -> str:
+    """
+    Translate a parameterized path into a regex.
+    """
+    idx = 0
+    path_regex = "^"
+    for match in PARAM_REGEX.finditer(path):
+        (param_name,) = match.groups()
+        if ":" in param_name:
+            param_name, param_type = param_name.split(":")
+        else:
+            param_type = "str"
+
+        ptrn = VALUE_PATTERNS[param_type]
+
+        path_regex += re.escape(path[idx : match.start()])
+        path_regex += f"(?P<{param_name}>{ptrn})"
+        idx = match.end()
+
+    path_regex += re.escape(path[idx:].split(":")[0]) + "$"
+    return path_regex
+
+
+def literal_prefix(path: str) -> str:
+    """
+    Return the literal text a key must start with to match the given
+    path (lower-cased, as routes are case-insensitive).
+    """
+    match = PARAM_REGEX.search(path)
+    if match is None:
+        return path.split(":")[0].lower()
+    return path[: match.start()].lower()
+
+
+class RouteTable:
+    """
+    Routes of a router, with their prefix index and their match cache
+    (both built lazily). A table is shared by cloned routers until one
+    of them is modified, so that clones reuse the index and the
+    memoized matches.
+    """
+
+    def __init__(self, routes: Optional[dict] = None, cache_size: int = 4096):
+        self.routes = defaultdict(set, routes or {})
+        # Prefix index, built lazily by match
+        self.index = None
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def build_index(self):
+        """
+        Group routes by literal prefix. The index is a tuple containing
+        the list of (route, regex, value), a {prefix: [position]} dict
+        and the distinct prefix lengths.
+        """
+        entries = []
+        by_prefix = defaultdict(list)
+        for pos, (route, (regex, value)) in enumerate(self.routes.items()):
+            entries.append((route, regex, value))
+            by_prefix[literal_prefix(route)].append(pos)
+        lengths = sorted(set(len(prefix) for prefix in by_prefix))
+        self.index = (entries, dict(by_prefix), lengths)
+
+    def _match(self, key: str) -> Optional[Match]:
+        """
+        Return a Match (route, value and match dict) if key is found.
+        Return None if not. Results are memoized by `match`, until a
+        route is added.
+        """
+        # Test for exact match
+        res = self.routes.get(key)
+        if res is not None:
+            _, value = res
+            return Match(key, value, {})
+
+        # Collect routes whose literal prefix matches the key
+        if self.index is None:
+            self.build_index()
+        entries, by_prefix, lengths = self.index
+        lower_key = key.lower()
+        candidates = []
+        for length in lengths:
+            if length > len(key):
+                break
+            positions = by_prefix.get(lower_key[:length])
+            if positions:
+                candidates.extend(positions)
+        # Test patterns, in insertion order
+        candidates.sort()
+        for pos in candidates:
+            route, regex, value = entries[pos]
+            m = regex.match(key)
+            if m:
+                return Match(route, value, m.groupdict())
+        return None
 
 
 class Router:
+    # Number of keys whose match (or absence of match) is memoized
+    cache_size = 4096
+
     def __init__(self, **routes: Any):
-        self.routes = defaultdict(set)
+        self.table = RouteTable(cache_size=self.cache_size)
+        # True if the table is shared with a clone
+        self._shared = False
         self.add_routes(routes)
 
+    @property
+    def routes(self) -> dict:
+        return self.table.routes
+
+    @property
+    def match(self) -> Callable[[str], Optional[Match]]:
+        """
+        Memoized version of `_match`
+        """
+        return self.table.match
+
     def add_routes(self, routes: dict[str, Any]):
         for path, value in routes.items():
             self.add(path, value)
 
     def clone(self):
         """
-        Return a proper copy of the current router.
+        Return a proper copy of the current router. Routes, the index
+        and the match cache are shared until one of the routers is
+        modified.
         """
-        # Unpack value tuples and pass results to constructor
         router = Router()
-        router.routes = self.routes.copy()
+        router.table = self.table
+        self._shared = router._shared = True
         return router
 
     def add(self, path: str, value: Any):
@@ -64,41 +189,22 @@ class Router:
             msg = "Anonymous pattern '{}' is not supported (in %s)"
             raise ValueError(msg % path)
 
-        idx = 0
-        path_regex = "^"
-        for match in PARAM_REGEX.finditer(path):
-            (param_name,) = match.groups()
-            if ":" in param_name:
-                param_name, param_type = param_name.split(":")
-            else:
-                param_type = "str"
-
-            ptrn = VALUE_PATTERNS[param_type]
+        if self._shared:
+            self.table = RouteTable(self.table.routes, self.cache_size)
+            self._shared = False
+        else:
+            self.table.index = None
+            self.table.match.cache_clear()
+        self.table.routes[path] = (re.compile(route_regex(path), re.I), value)
 
-            path_regex += re.escape(path[idx : match.start()])
-            path_regex += f"(?P<{param_name}>{ptrn})"
-            idx = match.end()
-
-        path_regex += re.escape(path[idx:].split(":")[0]) + "$"
-        self.routes[path] = (re.compile(path_regex, re.I), value)
-
-    def match(self, key: str) -> Optional[Match]:
+    def cache_info(self):
         """
-        Return a tuple (value, match dict) if key is found. Return None if
-        not.
+        Statistics of the match cache (hits, misses, maxsize, currsize)
         """
-        # Test for exact match
-        res = self.routes.get(key)
-        if res is not None:
-            _, value = res
-            return Match(key, value, {})
-        # Test pattern
-        for route, (regex, value) in self.routes.items():
-            m = regex.match(key)
-            if not m:
-                continue
-            return Match(route, value, m.groupdict())
-        return None
+        return self.table.match.cache_info()
+
+    def _match(self, key: str) -> Optional[Match]:
+        return self.table._match(key)
 
     def get(self, key: str, default: Any = None):
         """
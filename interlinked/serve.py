@@ -0,0 +1,197 @@
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Any, Iterable, Optional
+import json
+import logging
+import os
+import socket
+import stat
+
+from interlinked.cache import MemoryCache
+from interlinked.exceptions import RemoteError
+
+logger = logging.getLogger("interlinked")
+
+
+def parse_address(address: str) -> "str | tuple[str, int]":
+    """
+    Return a unix socket path (if address contains a '/') or a (host,
+    port) tuple ('host:port' or 'port', on localhost by default).
+    """
+    if "/" in address:
+        return address
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Execute the run requests: POST /run with a json body containing
+    `targets`, and optionally `kw` and `config`. The response contains
+    the results by target (values that are not json serializable are
+    replaced by their repr).
+    """
+
+    def do_POST(self):
+        if self.path != "/run":
+            self.reply(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            targets = request["targets"]
+            if not isinstance(targets, list) or not all(
+                isinstance(target, str) for target in targets
+            ):
+                raise ValueError("targets must be a list of strings")
+            kw = request.get("kw") or {}
+            if not isinstance(kw, dict):
+                raise ValueError("kw must be an object")
+            reserved = [name for name in kw if name.startswith("_")]
+            if reserved:
+                raise ValueError(f"reserved parameters {reserved}")
+            config = request.get("config")
+            if config is not None and not isinstance(config, dict):
+                raise ValueError("config must be an object")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self.reply(400, {"error": f"Invalid request: {e}"})
+            return
+
+        wkf = self.server.wkf
+        try:
+            if config:
+                wkf = wkf.config(config)
+            results = wkf.run_many(targets, **kw)
+        except Exception as e:
+            logger.exception(f"Run of {targets} failed")
+            self.reply(500, {"error": str(e), "type": type(e).__name__})
+            return
+        self.reply(200, {"results": results})
+
+    def reply(self, status: int, body: dict):
+        payload = json.dumps(body, default=repr).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # Client address of unix sockets is empty, the handler expects
+        # a (host, port) tuple
+        request, _ = super().get_request()
+        return request, ("local", 0)
+
+
+def make_server(wkf, address: str, max_entries: int = 1024):
+    """
+    Create a server executing run requests on wkf, with a warm
+    in-memory cache of cell results shared by all requests (if the
+    workflow has no persistent cache).
+    """
+    if wkf.cache is None:
+        wkf = wkf.clone()
+        wkf.cache = MemoryCache(max_entries)
+
+    server_address = parse_address(address)
+    if isinstance(server_address, str):
+        remove_socket(server_address)
+        server = UnixHTTPServer(server_address, Handler)
+    else:
+        server = ThreadingHTTPServer(server_address, Handler)
+    server.wkf = wkf
+    return server
+
+
+def serve(wkf, address: str, max_entries: int = 1024):
+    server = make_server(wkf, address, max_entries)
+    logger.warning(f"Serving workflow {wkf.name} on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if isinstance(server, UnixHTTPServer):
+            remove_socket(server.server_address)
+
+
+def remove_socket(path: str):
+    """
+    Remove the unix socket at path if any (left by a previous server),
+    raises FileExistsError if path is not a socket.
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a unix socket")
+    os.remove(path)
+
+
+class UnixHTTPConnection(HTTPConnection):
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class Client:
+    """
+    Send run requests to a server started with `interlinked <src> serve`
+    """
+
+    def __init__(self, address: str, timeout: Optional[float] = None):
+        self.address = parse_address(address)
+        self.timeout = timeout
+
+    def connection(self) -> HTTPConnection:
+        if isinstance(self.address, str):
+            return UnixHTTPConnection(self.address, self.timeout)
+        host, port = self.address
+        return HTTPConnection(host, port, timeout=self.timeout)
+
+    def run_many(
+        self, targets: Iterable[str], config: Optional[dict] = None, **kw
+    ) -> dict:
+        """
+        Resolve the given targets on the server, return a {target:
+        result} dict. Raises RemoteError if the run failed.
+        """
+        body = json.dumps({"targets": list(targets), "kw": kw, "config": config})
+        conn = self.connection()
+        try:
+            conn.request(
+                "POST", "/run", body, headers={"Content-Type": "application/json"}
+            )
+            response = conn.getresponse()
+            payload = json.loads(response.read())
+        finally:
+            conn.close()
+        if response.status != 200:
+            error = payload.get("error")
+            if "type" in payload:
+                error = f"{payload['type']}: {error}"
+            raise RemoteError(error)
+        return payload["results"]
+
+    def run(self, *targets: str, config: Optional[dict] = None, **kw) -> Any:
+        results = self.run_many(targets, config=config, **kw)
+        values = tuple(results[target] for target in targets)
+        if len(values) == 1:
+            return values[0]
+        return values
@@ -0,0 +1,100 @@
+from typing import Any, Callable, Iterable, Iterator, Optional
+import queue
+import threading
+
+from interlinked.exceptions import StreamConsumed
+
+# Default number of chunks queued ahead of a consumer
+BUFFER_SIZE = 8
+
+_END = object()
+
+
+class Stream:
+    """
+    Lazy sequence of chunks, returned for the cells defined with a
+    generator function (or with `chunked=True`). The producer is called
+    once, so a stream can only be iterated once: chunks are not kept in
+    memory, and the cell is not executed again for another consumer
+    (StreamConsumed is raised instead). If `buffer` is set, chunks are
+    produced in a background thread and at most `buffer` of them are
+    queued ahead of the consumer.
+    """
+
+    def __init__(self, producer: Callable[[], Iterable], buffer: Optional[int] = None):
+        self.producer = producer
+        self.buffer = buffer
+        self.consumed = False
+        self.lock = threading.Lock()
+
+    def __iter__(self) -> Iterator:
+        with self.lock:
+            if self.consumed:
+                raise StreamConsumed(f"{self!r} can only be consumed once")
+            self.consumed = True
+        if self.buffer is None:
+            return iter(self.producer())
+        return prefetch(self.producer, self.buffer)
+
+    def __repr__(self):
+        return f"<Stream {getattr(self.producer, '__name__', self.producer)}>"
+
+
+def map_chunks(fn: Callable, kw: dict, buffer: Optional[int] = None) -> Stream:
+    """
+    Return a stream applying fn on each chunk of the streams found in
+    kw (zipped together), other values are passed as-is.
+    """
+    streams = {name: value for name, value in kw.items() if isinstance(value, Stream)}
+    if not streams:
+        raise ValueError(f"Chunked cell {fn.__name__} does not depend on a stream")
+
+    def producer():
+        for chunks in zip(*streams.values()):
+            yield fn(**{**kw, **dict(zip(streams, chunks))})
+
+    producer.__name__ = fn.__name__
+    return Stream(producer, buffer)
+
+
+def prefetch(producer: Callable[[], Iterable], size: int) -> Iterator[Any]:
+    """
+    Iterate on producer in a background thread, through a queue of the
+    given size. The producer blocks when the queue is full (so memory
+    stays bounded) and stops when the consumer does.
+    """
+    chunks = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for chunk in producer():
+                if not put((chunk, None)):
+                    return
+        except BaseException as exc:
+            put((_END, exc))
+        else:
+            put((_END, None))
+
+    # A dedicated thread is used instead of the run executor: a chain
+    # of streams longer than the executor pool would deadlock
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            chunk, exc = chunks.get()
+            if chunk is _END:
+                if exc is not None:
+                    raise exc
+                return
+            yield chunk
+    finally:
+        stop.set()
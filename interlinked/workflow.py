@@ -1,24 +1,55 @@
 import re
+import sys
 from dataclasses import dataclass
-from typing import Any, Callable, Optional
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Iterator, Optional
 from collections import defaultdict
-from functools import partial
-from inspect import signature, Signature
-from itertools import chain
+from copy import copy
+from concurrent.futures import Executor, FIRST_COMPLETED, Future, wait
+from functools import lru_cache, partial
+from hashlib import sha256
+from inspect import (
+    iscoroutinefunction,
+    isgeneratorfunction,
+    signature,
+    Signature,
+)
 from string import Formatter
-import time
+from contextlib import contextmanager, ExitStack
+from time import perf_counter, thread_time
 import logging
-
+import os
+import threading
+
+from interlinked.cache import (
+    DiskCache,
+    MemoryCache,
+    MISSING,
+    SingleFlight,
+    TTLCache,
+    Upstream,
+)
+from interlinked.profile import Hook, Record, size_of
 from interlinked.router import Router, Match, VALUE_PATTERNS
+from interlinked.stream import BUFFER_SIZE, Stream, map_chunks
 from interlinked.exceptions import (
     NoRootException,
     LoopException,
     UnknownDependency,
     InvalidValue,
+    CellTimeout,
+    RunCancelled,
+    RunTimeout,
 )
 
 logger = logging.getLogger("interlinked")
 
+# Maximum delay (in seconds) before a wait notices a cancellation
+POLL_INTERVAL = 0.1
+
+# Run options only supported by synchronous runs
+EVICTION_OPTIONS = ("_evict", "_spill", "_max_bytes")
+
 
 class Cell:
     """
@@ -27,18 +58,62 @@ class Cell:
     """
 
     def __init__(
-        self, workflow: "Workflow", patterns: tuple[str, ...], kw: Optional[dict] = None
+        self,
+        workflow: "Workflow",
+        patterns: tuple[str, ...],
+        kw: Optional[dict] = None,
+        batch: bool = False,
+        chunked: bool = False,
+        buffer: Optional[int] = None,
+        keep: bool = False,
+        cache: Optional[TTLCache] = None,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+        backoff: float = 0,
     ):
         self.patterns = [Pattern.from_string(p) for p in patterns]
         self.workflow = workflow
         self.fn = None
+        self.call_plan = None
         self.kw = kw or {}
+        # A batch cell receives a list of values for each parameter and
+        # returns the list of results
+        self.batch = batch
+        # A chunked cell is called on each chunk of the streams it
+        # depends on, and returns a stream
+        self.chunked = chunked
+        # Size of the queue of the returned streams in concurrent runs
+        self.buffer = buffer
+        self.stream = chunked
+        # Results of kept cells are never evicted from a run
+        self.keep = keep
+        # Results cache of the cell, shared by all runs (replaces the
+        # workflow cache for this cell)
+        self.cache = cache
+        # Maximum duration of a call (in seconds), number of new
+        # attempts after a failure and delay before the first one
+        # (doubled for each following attempt)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
         self.dependencies = {}
         self.mutators = {}
 
     def __call__(self, fn: Callable):
-        self.workflow.by_fn[fn].append(self)
+        # Not appended in-place, the list may be shared with clones
+        by_fn = self.workflow.by_fn
+        by_fn[fn] = [*by_fn[fn], self]
         self.fn = fn
+        self.call_plan = CallPlan(fn)
+        # Generator functions return a stream of chunks
+        self.stream = self.chunked or isgeneratorfunction(fn)
+        if self.stream and self.batch:
+            raise ValueError(f"Cell {fn.__name__} can not be both a batch and a stream")
+        if self.stream and self.cache is not None:
+            raise ValueError(f"Results of stream cell {fn.__name__} can not be cached")
+        if self.stream and (self.timeout is not None or self.retries):
+            msg = f"Stream cell {fn.__name__} can not have a timeout or retries"
+            raise ValueError(msg)
         return fn
 
     def depend(self, dependencies):
@@ -46,6 +121,24 @@ class Cell:
         return self
 
 
+@dataclass
+class Graph:
+    """
+    Dependency graph between the patterns of a workflow. Children
+    depend on their parents, roots have no parents and the topological
+    order lists parents before their children (patterns in a loop are
+    left out).
+    """
+
+    children: dict[str, list[str]]
+    parents: dict[str, list[str]]
+    roots: list[str]
+    order: list[str]
+
+    def __post_init__(self):
+        self.order_index = {node: pos for pos, node in enumerate(self.order)}
+
+
 class Workflow:
 
     _registry = {}
@@ -57,18 +150,28 @@ class Workflow:
         by_fn: Optional[dict[Callable, list[Cell]]] = None,
         base_kw: Optional[dict] = None,
         config: Optional[dict] = None,
+        cache: Optional[DiskCache | MemoryCache] = None,
+        single_flight: bool = False,
     ):
-        if name:
-            if name in Workflow._registry:
-                raise ValueError(f"Workflow {name} already defined!")
-            Workflow._registry[name] = self
         self.name = name
+        if name:
+            self.register()
         self.router = router or Router()
         self.by_fn = defaultdict(list)
         self.by_fn.update(by_fn or {})
+        # True if by_fn is shared with a clone, cells not shared with
+        # any clone
+        self._shared = False
+        self._owned = set()
         self.base_kw = {}
         self.base_kw.update(base_kw or {})
-        self._validated = False
+        # Dependency graph, built lazily
+        self._graph = None
+        # Persistent cache, shared by all runs
+        self.cache = cache
+        # Concurrent identical cell calls (across runs) are coalesced
+        self.flights = SingleFlight() if single_flight else None
+        self.hooks = []
         self.config_router = Router()
         if config:
             self.set_config(config)
@@ -77,42 +180,57 @@ class Workflow:
     def get(cls, name: str) -> "Workflow | None":
         return cls._registry.get(name)
 
+    def register(self):
+        if self.name in Workflow._registry:
+            raise ValueError(f"Workflow {self.name} already defined!")
+        Workflow._registry[self.name] = self
+
+    def add_hook(self, hook: Hook):
+        """
+        Register a hook, notified when runs start, end or fail to
+        execute a cell.
+        """
+        # Hooks list is not modified in-place, as it may be shared with
+        # clones
+        self.hooks = [*self.hooks, hook]
+
     def set_config(self, config: dict):
-        self.config_router = Router(**config)
+        templates = {route: Template(value) for route, value in config.items()}
+        self.config_router = Router(**templates)
 
     def validate(self):
-        if self._validated:
-            return
-
-        deps = self.deps()
-        roots = set(deps) - set(chain.from_iterable(deps.values()))
-        if not roots:
+        graph = self.graph()
+        if not graph.roots:
             raise NoRootException(f"No roots for workflow '{self.name}'")
 
-        for root in roots:
-            self._validate(root, deps, ancestors=tuple())
-        self._validated = True
-
-    def _validate(self, parent, deps, ancestors):
-        children = deps[parent]
-        for child in children:
-            if child in ancestors:
-                msg = (
-                    f'Loop detected in workflow "{self.name}" '
-                    f'(validation failed when evaluating "{child}")'
+        if len(graph.order) < len(graph.children):
+            # Nodes left out of the topological order are in a loop or
+            # depend on one, follow parents until a node is seen twice
+            node = next(n for n in graph.children if n not in graph.order_index)
+            seen = set()
+            while node not in seen:
+                seen.add(node)
+                node = next(
+                    p for p in graph.parents[node] if p not in graph.order_index
                 )
-                raise LoopException(msg)
-            self._validate(child, deps, ancestors + (child,))
+            msg = (
+                f'Loop detected in workflow "{self.name}" '
+                f'(validation failed when evaluating "{node}")'
+            )
+            raise LoopException(msg)
 
-    def deps(self):
+    def graph(self) -> "Graph":
         """
-        build {parent: [child]} dependency dictionary.
+        Return the (cached) dependency graph between the patterns of the
+        workflow.
         """
-        # Init dict
+        if self._graph is not None:
+            return self._graph
+
+        # Init dicts
         p2c = {p: [] for p in self.router.routes}
-        for pattern in self.router.routes:
-            match = self.router.match(pattern)
-            cell = match.value
+        c2p = {p: [] for p in self.router.routes}
+        for pattern, (_, cell) in self.router.routes.items():
             parents = (p.pattern for p in cell.dependencies.values())
             for parent in parents:
                 if parent not in p2c:
@@ -126,8 +244,28 @@ class Workflow:
                             f"in workflow '{self.name}'"
                         )
                 p2c[parent].append(pattern)
+                c2p[pattern].append(parent)
+
+        # Topological sort (Kahn's algorithm)
+        roots = [p for p, parents in c2p.items() if not parents]
+        in_degree = {p: len(parents) for p, parents in c2p.items()}
+        order = list(roots)
+        for node in order:
+            for child in p2c[node]:
+                in_degree[child] -= 1
+                if not in_degree[child]:
+                    order.append(child)
 
-        return p2c
+        self._graph = Graph(p2c, c2p, roots, order)
+        return self._graph
+
+    def deps(self):
+        """
+        build {parent: [child]} dependency dictionary (a copy, the
+        graph is cached).
+        """
+        graph = self.graph()
+        return {parent: list(children) for parent, children in graph.children.items()}
 
     def clone(
         self,
@@ -135,15 +273,25 @@ class Workflow:
         config: Optional[dict] = None,
         kw: Optional[dict] = None,
     ):
-        kw = kw or {}
-        config = config or self.config_router.routes.copy()
-        new_wkf = Workflow(
-            name=name or self.name + "_clone",
-            router=self.router.clone(),
-            by_fn=self.by_fn,
-            base_kw={**self.base_kw, **kw},
-            config=config,
-        )
+        """
+        Return a workflow sharing the cells, the config and the cache of
+        the current one. Routes and cells are copied on write, so that
+        calling `provide`, `depend` or `mutate` on one workflow does not
+        affect the other. The clone is only registered if a name is
+        given.
+        """
+        new_wkf = copy(self)
+        if name:
+            new_wkf.name = name
+            new_wkf.register()
+        new_wkf.router = self.router.clone()
+        self._shared = new_wkf._shared = True
+        self._owned = set()
+        new_wkf._owned = set()
+        if kw:
+            new_wkf.base_kw = {**self.base_kw, **kw}
+        if config:
+            new_wkf.set_config(config)
         return new_wkf
 
     def kw(self, **kw):
@@ -152,34 +300,122 @@ class Workflow:
     def config(self, config: dict):
         return self.clone(config=config)
 
-    def provide(self, *patterns: str, _override=False, **kw):
-        self._validated = False
+    def provide(
+        self,
+        *patterns: str,
+        _override=False,
+        batch=False,
+        chunked=False,
+        buffer: Optional[int] = None,
+        keep=False,
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        stale: float = 0,
+        timeout: Optional[float] = None,
+        retries: int = 0,
+        backoff: float = 0,
+        **kw,
+    ):
+        """
+        Register the decorated function as the provider of the given
+        patterns. If `ttl` (in seconds) or `max_entries` is set, results
+        are kept in memory and reused by the following runs until they
+        expire, results expired for less than `stale` seconds are still
+        used while being recomputed in the background.
+
+        A call lasting more than `timeout` seconds raises CellTimeout
+        (the function itself can not be interrupted, its result is
+        ignored). Failed calls are attempted again `retries` times,
+        after `backoff` seconds (doubled for each attempt).
+        """
+        self._graph = None
+        if self._shared:
+            self.by_fn = defaultdict(list, self.by_fn)
+            self._shared = False
         if not _override:
             for pattern in patterns:
                 if pattern in self.router:
                     msg = f"{pattern} already defined in Workflow '{self.name}'"
                     raise ValueError(msg)
-        cell = Cell(self, patterns, kw)
+        cache = None
+        if ttl is not None or max_entries is not None:
+            cache = TTLCache(ttl, max_entries or 1024, stale)
+        cell = Cell(
+            self,
+            patterns,
+            kw,
+            batch=batch,
+            chunked=chunked,
+            buffer=buffer,
+            keep=keep,
+            cache=cache,
+            timeout=timeout,
+            retries=retries,
+            backoff=backoff,
+        )
         for pattern in patterns:
             self.router.add(pattern, cell)
+        self._owned.add(cell)
         return cell
 
+    def own(self, fn: Callable) -> list[Cell]:
+        """
+        Return the cells of fn, cells shared with a clone are replaced
+        by copies first (so they can be modified).
+        """
+        cells = self.by_fn[fn]
+        if all(cell in self._owned for cell in cells):
+            return cells
+        if self._shared:
+            self.by_fn = defaultdict(list, self.by_fn)
+            self._shared = False
+        owned = []
+        for cell in cells:
+            if cell not in self._owned:
+                shared, cell = cell, copy(cell)
+                cell.workflow = self
+                for pattern in cell.patterns:
+                    _, routed = self.router.routes.get(pattern.pattern, (None, None))
+                    if routed is shared:
+                        self.router.add(pattern.pattern, cell)
+                self._owned.add(cell)
+            owned.append(cell)
+        self.by_fn[fn] = owned
+        return owned
+
+    def invalidate(self, *patterns: str) -> int:
+        """
+        Drop the results of the resources matching the given patterns
+        (or resource names) from the cell caches, see the `ttl` option
+        of `provide`. Returns the number of results dropped.
+        """
+        router = Router(**{pattern: True for pattern in patterns})
+        cells = {id(cell): cell for _, cell in self.router.routes.values()}
+        return sum(
+            cell.cache.invalidate(router.match)
+            for cell in cells.values()
+            if cell.cache is not None
+        )
+
     def depend(self, **dependencies):
-        self._validated = False
+        self._graph = None
         if dependencies:
             # convert pattern strings into objects
             dependencies = {k: Pattern.from_string(v) for k, v in dependencies.items()}
 
         def decorator(fn):
-            for cell in self.by_fn[fn]:
+            for cell in self.own(fn):
                 cell.depend(dependencies)
             return fn
 
         return decorator
 
     def mutate(self, **mutators):
+        # Inspect mutators signatures once
+        mutators = {alias: CallPlan(fn) for alias, fn in mutators.items()}
+
         def decorator(fn):
-            for cell in self.by_fn[fn]:
+            for cell in self.own(fn):
                 cell.mutators = {**mutators, **cell.mutators}
             return fn
 
@@ -199,28 +435,429 @@ class Workflow:
         # used for pattern matching
         return match
 
-    def run(self, *resource_name: str, **extra_kw):
+    def run(
+        self, *resource_name: str, _executor: Optional[Executor] = None, **extra_kw
+    ):
         """
-        Create a Run instance and execute it
+        Create a Run instance and execute it. If an executor is given,
+        independent cells are executed concurrently. Eviction options
+        (`_evict`, `_spill` and `_max_bytes`) and limits (`_timeout` and
+        `_cancel`, an event that cancels the run when set) are passed to
+        the run.
         """
-        run = Run(self, **extra_kw)
-        results = tuple(run.resolve(name) for name in resource_name)
+        run = Run(self, _executor=_executor, **extra_kw)
+        results = tuple(run.resolve_all(resource_name))
         if len(results) == 1:
             return results[0]
         return results
 
+    def plan(self, *resource_name: str, **extra_kw) -> "Plan":
+        """
+        Build the concrete graph of the resources needed by the given
+        ones (no cell is executed). The plan can be executed, possibly
+        several times, without matching resources nor formatting
+        parameters again.
+        """
+        run = Run(self, **extra_kw)
+        return Plan(self, resource_name, run.steps_for(resource_name), extra_kw)
+
+    def session(self, **extra_kw) -> "Session":
+        """
+        Create a Session: a run that keeps its results between calls and
+        only recomputes the ones affected by a change.
+        """
+        return Session(self, **extra_kw)
+
+    def run_many(
+        self,
+        resource_names: Iterable[str],
+        _executor: Optional[Executor] = None,
+        **extra_kw,
+    ) -> dict:
+        """
+        Resolve all the given resources in one run and return a
+        {resource name: result} dict. Common dependencies are computed
+        once and batch cells are called once per group of ready
+        resources.
+        """
+        return dict(self.iter_many(resource_names, _executor=_executor, **extra_kw))
+
+    def iter_many(
+        self,
+        resource_names: Iterable[str],
+        _executor: Optional[Executor] = None,
+        **extra_kw,
+    ) -> Iterator[tuple[str, Any]]:
+        """
+        Like run_many, but yield (resource name, result) tuples as soon
+        as each resource is available.
+        """
+        run = Run(self, _executor=_executor, **extra_kw)
+        return run.iter_many(resource_names)
+
+    async def arun(
+        self, *resource_name: str, _executor: Optional[Executor] = None, **extra_kw
+    ):
+        """
+        Create a Run instance and execute it in the running event loop.
+        Coroutine cells are awaited, other cells are executed in the
+        given executor (or the loop default one). Eviction options are
+        not supported.
+        """
+        import asyncio
+
+        run = Run(self, _executor=_executor, **extra_kw)
+        run.reject_eviction("Asynchronous runs")
+        results = await asyncio.gather(*(run.aresolve(n) for n in resource_name))
+        if len(results) == 1:
+            return results[0]
+        return tuple(results)
+
+
+@dataclass
+class Step:
+    """
+    Concrete resolution of a resource: the matched cell, its keyword
+    parameters and the names of the resources it depends on (by alias).
+    """
+
+    resource_name: str
+    match: Match
+    kw: dict
+    dependencies: dict
+
+    @property
+    def cell(self) -> Cell:
+        return self.match.value
+
+    def outputs(self) -> list[str]:
+        """
+        Names of the resources provided by one call of the cell
+        """
+        if len(self.cell.patterns) == 1:
+            return [self.resource_name]
+        return [pattern.fmt(self.match.kw) for pattern in self.cell.patterns]
+
 
 class Run:
-    def __init__(self, wkf, **extra_kw):
+    """
+    Resolution of resources of a workflow. Results are kept in the run
+    cache, unless `_evict` is set: in that case intermediate results
+    are dropped as soon as all the cells depending on them are done
+    (requested resources and cells provided with `keep=True` are
+    retained). If `_max_bytes` is also set, results waiting for their
+    consumers are spilled to the `_spill` cache (largest first) when
+    the total size of the results held by the run exceeds it.
+
+    No cell is started once the run is cancelled (see `cancel`, or set
+    the `_cancel` event) or once it lasted more than `_timeout`
+    seconds, the run then raises RunCancelled (RunTimeout). If
+    `_timeout` or `_cancel` is given, the run also stops waiting for
+    the running cells (their functions are called in another thread
+    and left running in the background). Completed results are kept.
+    """
+
+    def __init__(
+        self,
+        wkf,
+        _executor: Optional[Executor] = None,
+        _evict: bool = False,
+        _spill: Optional[DiskCache] = None,
+        _max_bytes: Optional[int] = None,
+        _timeout: Optional[float] = None,
+        _cancel: Optional[threading.Event] = None,
+        **extra_kw,
+    ):
         self.wkf = wkf
+        self.executor = _executor
         self.extra_kw = extra_kw
         # Cache at instance level
         self.cache = {}
+        # Approximate size of the cached results, current total and peak
+        # (only measured if the run has hooks or evicts results)
+        self.sizes = {}
+        self.memory = 0
+        self.peak_memory = 0
+        # Eviction: {resource name: number of consumers not yet done},
+        # retained resources and spilled ones ({resource name: key})
+        self.evict = _evict or _spill is not None
+        if _spill is not None and _spill.max_bytes is not None:
+            # Spilled results must stay available until consumed
+            raise ValueError("A spill cache can not have max_bytes")
+        self.spill_cache = _spill
+        self.max_bytes = _max_bytes
+        self.measure = self.evict or _max_bytes is not None
+        self.consumers = {}
+        self.retained = set()
+        self.spilled = {}
+        self.id = os.urandom(16).hex()
+        # {resource name: key of its result in its cache}
+        self.keys = {}
+        # Number of lookups served by the cache, and of resources computed
+        self.hits = 0
+        self.misses = 0
+        # Tasks of the resources being resolved by aresolve, and the
+        # dependencies each of them is waiting for
+        self.pending = {}
+        self.waits = {}
+        # {resource name: Record}, only if the run has hooks
+        self.records = {}
+        self.hooks = list(wkf.hooks)
+        # Steps of a Plan, used instead of matching the resources
+        self.prepared = {}
+        # Cancellation and deadline (perf_counter time)
+        self.cancelled = threading.Event() if _cancel is None else _cancel
+        self.timeout = _timeout
+        self.deadline = None
+        if _timeout is not None:
+            self.deadline = perf_counter() + _timeout
+        # Calls are interrupted by the deadline and the cancel event
+        self.interruptible = _timeout is not None or _cancel is not None
+
+    def cancel(self):
+        """
+        Stop starting new cells (can be called from any thread)
+        """
+        self.cancelled.set()
+
+    def check(self):
+        """
+        Raise RunCancelled if the run is cancelled or past its deadline
+        """
+        if self.cancelled.is_set():
+            raise RunCancelled(f"Run of workflow {self.wkf.name} cancelled")
+        if self.deadline is not None and perf_counter() >= self.deadline:
+            msg = f"Run of workflow {self.wkf.name} exceeded {self.timeout}s"
+            raise RunTimeout(msg)
+
+    def reject_eviction(self, kind: str):
+        """
+        Raise ValueError if eviction options are set, for the kinds of
+        runs that do not support them.
+        """
+        if self.evict or self.max_bytes is not None:
+            options = ", ".join(EVICTION_OPTIONS)
+            raise ValueError(f"{kind} do not support the {options} options")
+
+    def time_left(self, timeout: Optional[float]) -> Optional[float]:
+        """
+        Return the given timeout, bounded by the run deadline
+        """
+        if self.deadline is None:
+            return timeout
+        left = max(self.deadline - perf_counter(), 0)
+        return left if timeout is None else min(timeout, left)
+
+    def resolve_all(self, resource_names: Iterable[str]) -> list:
+        """
+        Resolve all the given resources, concurrently if the run has an
+        executor.
+        """
+        if self.executor is None and not self.evict:
+            return [self.resolve(name) for name in resource_names]
+        resource_names = list(resource_names)
+        self.retained.update(resource_names)
+        self.execute_steps(self.steps_for(resource_names))
+        return [self.load(name) for name in resource_names]
+
+    def iter_many(self, resource_names: Iterable[str]) -> Iterator[tuple[str, Any]]:
+        """
+        Resolve the given resources with common steps and yield (name,
+        result) tuples as soon as each one is available.
+        """
+        resource_names = list(dict.fromkeys(resource_names))
+        self.retained.update(resource_names)
+        for name in resource_names:
+            if name in self.cache:
+                yield name, self.cache[name]
+
+        steps = self.steps_for(resource_names)
+        targets = defaultdict(list)
+        for name in resource_names:
+            if name in steps:
+                targets[id(steps[name])].append(name)
+        for step in self.iter_steps(steps):
+            for name in targets.pop(id(step), []):
+                yield name, self.load(name)
 
     def resolve(self, resource_name) -> Any:
-        if (res := self.cache.get(resource_name)) is not None:
-            return res
+        """
+        Resolve a resource and its dependencies, depth first. An
+        explicit stack is used instead of recursion, so chains of
+        dependencies are not limited by the interpreter stack. Errors
+        are annotated with the path of resources being resolved.
+        """
+        value = self.lookup(resource_name)
+        if value is not MISSING:
+            return value
+
+        # Frames of the resources being resolved: [step, iterator on
+        # the cell dependencies, alias of the dependency being resolved]
+        stack = []
+        visiting = set()
+        name = resource_name
+        try:
+            while True:
+                if name is not None:
+                    self.misses += 1
+                    step = self.prepare(name)
+                    stack.append([step, iter(step.cell.dependencies.items()), None])
+                    visiting.add(name)
+                    name = None
+
+                frame = stack[-1]
+                step, dependencies, alias = frame
+                kw = step.kw
+                if alias is not None:
+                    kw[alias] = value
+                for alias, resource in dependencies:
+                    dependency = step.dependencies.get(alias)
+                    if dependency is None:
+                        dependency = self.dependency_name(step, resource, kw)
+                        step.dependencies[alias] = dependency
+                    if dependency in visiting:
+                        msg = (
+                            f'Loop detected in workflow "{self.wkf.name}" '
+                            f'(resolution failed when evaluating "{dependency}")'
+                        )
+                        raise LoopException(msg)
+                    value = self.lookup(dependency)
+                    if value is MISSING:
+                        frame[2] = alias
+                        name = dependency
+                        break
+                    kw[alias] = value
+                else:
+                    value = self.store(step, self.execute(step, kw))
+                    stack.pop()
+                    visiting.discard(step.resource_name)
+                    if not stack:
+                        return value
+        except Exception as exc:
+            path = [frame[0].resource_name for frame in stack]
+            if name is not None:
+                path.append(name)
+            if len(path) > 1 and hasattr(exc, "add_note"):
+                exc.add_note("Dependency path: " + " -> ".join(path))
+            raise
+
+    def lookup(self, resource_name: str) -> Any:
+        """
+        Return the cached value of a resource, MISSING if it has to be
+        computed
+        """
+        if resource_name in self.cache:
+            self.hit(resource_name)
+            return self.cache[resource_name]
+        return MISSING
+
+    async def aresolve(self, resource_name: str, waiter=None) -> Any:
+        """
+        Asynchronous version of resolve. Dependencies of a cell are
+        resolved concurrently, and a resource requested while being
+        resolved is awaited instead of being recomputed. `waiter` is the
+        task of the cell requesting the resource (if any), used to
+        detect loops.
+        """
+        import asyncio
+
+        if resource_name in self.cache:
+            self.hit(resource_name)
+            return self.cache[resource_name]
 
+        if resource_name in self.pending:
+            self.hit(resource_name)
+            task = self.pending[resource_name]
+            if waiter is not None and not task.done() and self.waits_for(task, waiter):
+                msg = (
+                    f'Loop detected in workflow "{self.wkf.name}" '
+                    f'(resolution failed when evaluating "{resource_name}")'
+                )
+                raise LoopException(msg)
+        else:
+            self.misses += 1
+            step = self.prepare(resource_name)
+            task = asyncio.ensure_future(self._aresolve(step))
+            for output in step.outputs():
+                self.pending.setdefault(output, task)
+            self.pending[resource_name] = task
+        await self.pending[resource_name]
+        return self.cache[resource_name]
+
+    async def _aresolve(self, step: Step) -> Any:
+        import asyncio
+
+        kw = step.kw
+        for alias, resource in step.cell.dependencies.items():
+            if alias not in step.dependencies:
+                step.dependencies[alias] = self.dependency_name(step, resource, kw)
+        task = asyncio.current_task()
+        self.waits[task] = tuple(step.dependencies.values())
+        try:
+            values = await asyncio.gather(
+                *(self.aresolve(dep, task) for dep in step.dependencies.values())
+            )
+        finally:
+            del self.waits[task]
+        kw.update(zip(step.dependencies, values))
+
+        cell = step.cell
+        if not iscoroutinefunction(cell.fn):
+            loop = asyncio.get_running_loop()
+            res = await loop.run_in_executor(self.executor, self.execute, step, kw)
+            return self.store(step, res)
+
+        self.check()
+        with self.track(step) as record:
+            kw, key, res = self.bind(step, kw)
+            if res is MISSING:
+                if cell.batch:
+                    kw = {name: [value] for name, value in kw.items()}
+                    (res,) = await self.acall(step, kw)
+                else:
+                    res = await self.acall(step, kw)
+                self.save(step, key, res)
+            if record is not None:
+                record.size = size_of(res)
+        return self.store(step, res)
+
+    def waits_for(self, task, target) -> bool:
+        """
+        True if the resolution task waits (directly or not) for target
+        """
+        todo = [task]
+        seen = set()
+        while todo:
+            task = todo.pop()
+            if task is target:
+                return True
+            if task in seen:
+                continue
+            seen.add(task)
+            for name in self.waits.get(task, ()):
+                if name in self.pending:
+                    todo.append(self.pending[name])
+        return False
+
+    def prepare(self, resource_name: str) -> Step:
+        """
+        Match the resource name and collect the keyword parameters
+        (workflow, pattern, run and config ones) of the cell.
+        """
+        planned = self.prepared.get(resource_name)
+        if planned is not None and planned.resource_name == resource_name:
+            # Steps of a Plan are copied, as runs modify them
+            step = Step(
+                resource_name,
+                planned.match,
+                dict(planned.kw),
+                dict(planned.dependencies),
+            )
+            if self.hooks:
+                self.records[resource_name] = Record(resource_name, step.dependencies)
+            return step
+
+        start_time = perf_counter()
         # Search fn
         match = self.wkf.by_name(resource_name)
         # Identify config cell and apply auto-formating
@@ -229,45 +866,978 @@ class Run:
             config_entry = rformat(config_entry, **match.kw)
 
         kw = {**self.wkf.base_kw, **match.kw, **self.extra_kw, **config_entry}
-        # Resolve dependencies
-        cell = match.value
-        if cell.dependencies:
-            for alias, resource in cell.dependencies.items():
-                try:
-                    resource = resource.fmt(kw)
-                except KeyError as e:
-                    raise KeyError(
-                        f"Missing dependency {resource} for {resource_name} in workflow {self.wkf.name}"
-                    ) from e
-                read = bind(self.resolve, [resource])
-                kw[alias] = read()
-
-        # Mutate parameters
-        for alias, fn in cell.mutators.items():
-            kw[alias] = bind(fn, kw=kw)()
-
-        # Run function
-        logger.debug(f"Workflow {self.wkf.name} running {cell.fn.__name__}")
-
-        start_time = time.time()
-        res = bind(cell.fn, kw=kw)()
-        end_time = time.time()
-
-        execution_time = end_time - start_time
-        logger.debug(f"Call of {cell.fn.__name__} took {execution_time:.3f}s")
-
-        # Cache & return simple cell
+        step = Step(resource_name, match, kw, {})
+        if self.hooks:
+            self.records[resource_name] = Record(
+                resource_name, step.dependencies, overhead=perf_counter() - start_time
+            )
+        return step
+
+    def dependency_name(self, step: Step, resource: "Pattern", kw: dict) -> str:
+        try:
+            return resource.fmt(kw)
+        except KeyError as e:
+            raise KeyError(
+                f"Missing dependency {resource} for {step.resource_name} in workflow {self.wkf.name}"
+            ) from e
+
+    def steps_for(self, resource_names: Iterable[str]) -> dict[str, Step]:
+        """
+        Prepare the given resources and all their (not yet cached)
+        dependencies. Returns a dict {resource name: step}, a step of
+        a multi-pattern cell is registered under all its outputs.
+        """
+        steps = {}
+        visiting = set()
+        todo = [(name, False) for name in reversed(list(resource_names))]
+        while todo:
+            name, done = todo.pop()
+            if done:
+                visiting.discard(name)
+                continue
+            if name in visiting:
+                msg = (
+                    f'Loop detected in workflow "{self.wkf.name}" '
+                    f'(planning failed when evaluating "{name}")'
+                )
+                raise LoopException(msg)
+            if name in steps or name in self.cache:
+                self.hit(name)
+                continue
+            self.misses += 1
+
+            step = self.prepare(name)
+            for alias, resource in step.cell.dependencies.items():
+                if alias not in step.dependencies:
+                    dependency = self.dependency_name(step, resource, step.kw)
+                    step.dependencies[alias] = dependency
+            for output in step.outputs():
+                steps.setdefault(output, step)
+            steps[name] = step
+
+            visiting.add(name)
+            todo.append((name, True))
+            todo.extend((dep, False) for dep in reversed(step.dependencies.values()))
+        return steps
+
+    def execute_steps(self, steps: dict[str, Step]):
+        """
+        Execute all the planned steps
+        """
+        for _ in self.iter_steps(steps):
+            pass
+
+    def iter_steps(self, steps: dict[str, Step]) -> Iterator[Step]:
+        """
+        Execute steps as soon as their dependencies are available (in
+        the run executor if any) and yield them once their result is
+        stored.
+        """
+        unique = list({id(step): step for step in steps.values()}.values())
+        waiting = {}
+        dependents = defaultdict(list)
+        for step in unique:
+            producers = {
+                id(steps[dep]): steps[dep]
+                for dep in step.dependencies.values()
+                if dep in steps
+            }
+            waiting[id(step)] = len(producers)
+            for producer in producers.values():
+                dependents[id(producer)].append(step)
+            if self.evict:
+                for dep in step.dependencies.values():
+                    if dep in steps:
+                        self.consumers[dep] = self.consumers.get(dep, 0) + 1
+
+        ready = [step for step in unique if not waiting[id(step)]]
+        futures = {}
+        try:
+            while ready or futures:
+                completed = []
+                for group in self.batches(ready):
+                    kws = []
+                    for step in group:
+                        kw = dict(step.kw)
+                        for alias, dependency in step.dependencies.items():
+                            kw[alias] = self.load(dependency)
+                        kws.append(kw)
+                    if self.executor is None:
+                        completed.append((group, self.execute_many(group, kws)))
+                    else:
+                        future = self.executor.submit(self.execute_many, group, kws)
+                        futures[future] = group
+                ready = []
+
+                if not completed:
+                    done = ()
+                    while not done:
+                        timeout = self.time_left(POLL_INTERVAL)
+                        done, _ = wait(futures, timeout, FIRST_COMPLETED)
+                        if not done:
+                            self.check()
+                    for future in done:
+                        completed.append((futures.pop(future), future.result()))
+
+                for group, results in completed:
+                    for step, res in zip(group, results):
+                        self.store(step, res)
+                        yield step
+                        if self.evict:
+                            self.consumed(step)
+                        for dependent in dependents[id(step)]:
+                            waiting[id(dependent)] -= 1
+                            if not waiting[id(dependent)]:
+                                ready.append(dependent)
+        finally:
+            # Do not start pending cells if an error occured
+            for future in futures:
+                future.cancel()
+
+    def batches(self, steps: list[Step]) -> list[list[Step]]:
+        """
+        Group steps of batch cells, other steps are executed one by one
+        """
+        groups = []
+        by_cell = {}
+        for step in steps:
+            if not step.cell.batch:
+                groups.append([step])
+            elif id(step.cell) in by_cell:
+                by_cell[id(step.cell)].append(step)
+            else:
+                by_cell[id(step.cell)] = [step]
+                groups.append(by_cell[id(step.cell)])
+        return groups
+
+    def execute_many(self, steps: list[Step], kws: list[dict]) -> list:
+        """
+        Execute a group of steps, as returned by `batches`
+        """
+        if not steps[0].cell.batch:
+            return [self.execute(step, kw) for step, kw in zip(steps, kws)]
+        self.check()
+
+        cell = steps[0].cell
+        results = [MISSING] * len(steps)
+        keys = [None] * len(steps)
+        # Group calls per parameter names
+        calls = defaultdict(list)
+        for pos, (step, kw) in enumerate(zip(steps, kws)):
+            kw, keys[pos], results[pos] = self.bind(step, kw)
+            if results[pos] is MISSING:
+                calls[tuple(kw)].append((pos, kw))
+            elif step.resource_name in self.records:
+                self.records[step.resource_name].size = size_of(results[pos])
+
+        for names, items in calls.items():
+            # All the steps of the batch share the same measures
+            with ExitStack() as stack:
+                records = [
+                    stack.enter_context(self.track(steps[pos])) for pos, _ in items
+                ]
+                kw = {n: [kw[n] for _, kw in items] for n in names}
+                res = self.call(steps[items[0][0]], kw)
+                if len(res) != len(items):
+                    msg = (
+                        f"Batch cell {cell.fn.__name__} returned {len(res)} results "
+                        f"for {len(items)} inputs"
+                    )
+                    raise ValueError(msg)
+                for (pos, _), record, item_res in zip(items, records, res):
+                    results[pos] = item_res
+                    if record is not None:
+                        record.size = size_of(item_res)
+                    self.save(steps[pos], keys[pos], item_res)
+        return results
+
+    def execute(self, step: Step, kw: dict) -> Any:
+        """
+        Apply mutators and call the cell function
+        """
+        cell = step.cell
+        if cell.batch:
+            (res,) = self.execute_many([step], [kw])
+            return res
+
+        self.check()
+        if cell.stream:
+            # The production of the stream is tracked, not its creation
+            kw, _, _ = self.bind(step, kw)
+            return self.stream(step, kw)
+        with self.track(step) as record:
+            kw, key, res = self.bind(step, kw)
+            if res is MISSING:
+                res = self.call(step, kw)
+                self.save(step, key, res)
+            if record is not None:
+                record.size = size_of(res)
+        return res
+
+    def call(self, step: Step, kw: dict) -> Any:
+        """
+        Call the cell function, concurrent identical calls are
+        coalesced if the workflow has single flight enabled.
+        """
+        flights = self.wkf.flights
+        if flights is None:
+            return self.invoke(step, kw)
+        key = flights.key(step.resource_name, step.cell.fn, kw)
+        wait_flight = partial(self.wait_flight, step)
+        return flights.do(key, self.invoke, step, kw, wait=wait_flight)
+
+    def wait_flight(self, step: Step, future: Future) -> Any:
+        """
+        Wait for the result of an identical call made by another caller,
+        within the cell timeout and the run deadline.
+        """
+        start = perf_counter()
+        while True:
+            done, _ = wait([future], self.poll_timeout(step, start))
+            if done:
+                return future.result()
+
+    def poll_timeout(self, step: Step, start: float) -> float:
+        """
+        Check the run and the timeout of a call started at `start`, and
+        return how long to wait for it before checking again (so that
+        cancellation is noticed within POLL_INTERVAL seconds).
+        """
+        self.check()
+        timeout = step.cell.timeout
+        if timeout is None:
+            return self.time_left(POLL_INTERVAL)
+        left = start + timeout - perf_counter()
+        if left <= 0:
+            msg = f"Call of {step.cell.fn.__name__} exceeded {timeout:.2f}s"
+            raise CellTimeout(msg)
+        return self.time_left(min(POLL_INTERVAL, left))
+
+    def invoke(self, step: Step, kw: dict) -> Any:
+        """
+        Call the cell function, with the timeout and the retries of the
+        cell.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self.call_fn(step, kw)
+            except Exception as exc:
+                delay = self.retry_delay(step, attempt, exc)
+                if delay is None:
+                    raise
+            # Sleep, unless the run is cancelled in the meantime
+            self.cancelled.wait(delay)
+            self.check()
+            attempt += 1
+
+    def bounded(self, step: Step) -> bool:
+        """
+        True if a call of the cell can be interrupted: by its own timeout
+        or by the run deadline and cancel event.
+        """
+        return step.cell.timeout is not None or self.interruptible
+
+    def retry_delay(self, step: Step, attempt: int, exc: Exception) -> Optional[float]:
+        """
+        Delay before attempting again a failed call (`attempt` is the
+        number of retries already made), None if exc must be raised.
+        Raises RunCancelled instead if the run is cancelled or past its
+        deadline (the cell may have timed out because of it).
+        """
+        self.check()
+        cell = step.cell
+        if attempt >= cell.retries:
+            return None
+        delay = cell.backoff * 2**attempt
+        logger.warning(
+            f"Call of {cell.fn.__name__} failed ({exc!r}), "
+            f"attempt {attempt + 1}/{cell.retries} in {delay:.2f}s"
+        )
+        return self.time_left(delay)
+
+    def call_fn(self, step: Step, kw: dict) -> Any:
+        """
+        Call the cell function, in a worker process if the run executor
+        is a ProcessPool. If the call is `bounded`, it is made in another
+        thread (unless in a worker), whose cpu time is added to the
+        record of the step, and CellTimeout (or RunCancelled) is raised
+        as soon as the cell timeout (or the run) expires.
+        """
+        # Imported lazily, an executor can only be a ProcessPool if the
+        # module is loaded
+        process = sys.modules.get("interlinked.process")
+        if process is not None and isinstance(self.executor, process.ProcessPool):
+            timeout = self.time_left(step.cell.timeout)
+            return self.executor.call(self.wkf, step.match.route, kw, timeout)
+        if not self.bounded(step):
+            return step.cell.fn(**kw)
+
+        future = Future()
+        cpu_time = []
+
+        def target():
+            start_cpu = thread_time()
+            try:
+                future.set_result(step.cell.fn(**kw))
+            except BaseException as exc:
+                future.set_exception(exc)
+            finally:
+                cpu_time.append(thread_time() - start_cpu)
+
+        # A daemon thread is used, so that a hung call does not block
+        # the interpreter exit
+        threading.Thread(target=target, daemon=True).start()
+        start = perf_counter()
+        done = ()
+        while not done:
+            done, _ = wait([future], self.poll_timeout(step, start))
+        record = self.records.get(step.resource_name)
+        if record is not None:
+            record.cpu_time += sum(cpu_time)
+        return future.result()
+
+    async def acall(self, step: Step, kw: dict) -> Any:
+        """
+        Asynchronous version of call, for coroutine cells
+        """
+        flights = self.wkf.flights
+        if flights is None:
+            return await self.ainvoke(step, kw)
+        key = flights.key(step.resource_name, step.cell.fn, kw)
+        wait_flight = partial(self.await_flight, step)
+        return await flights.ado(key, self.ainvoke, step, kw, wait=wait_flight)
+
+    async def await_flight(self, step: Step, future: Future) -> Any:
+        """
+        Asynchronous version of wait_flight
+        """
+        import asyncio
+
+        result = asyncio.wrap_future(future)
+        start = perf_counter()
+        while True:
+            timeout = self.poll_timeout(step, start)
+            done, _ = await asyncio.wait([result], timeout=timeout)
+            if done:
+                return result.result()
+
+    async def ainvoke(self, step: Step, kw: dict) -> Any:
+        """
+        Asynchronous version of invoke, the coroutine is cancelled when
+        it times out or when the run expires.
+        """
+        import asyncio
+
+        attempt = 0
+        while True:
+            task = asyncio.ensure_future(step.cell.fn(**kw))
+            try:
+                if not self.bounded(step):
+                    return await task
+                start = perf_counter()
+                done = ()
+                while not done:
+                    timeout = self.poll_timeout(step, start)
+                    done, _ = await asyncio.wait([task], timeout=timeout)
+                return task.result()
+            except Exception as exc:
+                delay = self.retry_delay(step, attempt, exc)
+                if delay is None:
+                    raise
+            finally:
+                # Timed out (or the caller is cancelled)
+                if not task.done():
+                    task.cancel()
+            await asyncio.sleep(delay)
+            self.check()
+            attempt += 1
+
+    def stream(self, step: Step, kw: dict) -> Stream:
+        """
+        Wrap the cell of step in a stream. In concurrent runs chunks
+        are produced ahead of the consumer, through a bounded queue.
+        """
+        cell = step.cell
+        buffer = None
+        if self.executor is not None:
+            buffer = cell.buffer or BUFFER_SIZE
+        if cell.chunked:
+            producer = map_chunks(cell.fn, kw).producer
+        else:
+            producer = partial(cell.fn, **kw)
+        return Stream(partial(self.produce, step, producer), buffer)
+
+    def produce(self, step: Step, producer: Callable[[], Iterable]) -> Iterator:
+        """
+        Iterate on the chunks of a stream cell. The production is
+        measured and notified to the hooks like a cell call (it includes
+        the time spent by the consumer between chunks if the stream is
+        not buffered), the run cancellation is checked for each chunk.
+        """
+        with self.track(step):
+            chunks = iter(producer())
+            try:
+                while True:
+                    self.check()
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        return
+                    try:
+                        yield chunk
+                    except GeneratorExit:
+                        # Consumer stopped early
+                        return
+            finally:
+                close = getattr(chunks, "close", None)
+                if close is not None:
+                    close()
+
+    @contextmanager
+    def track(self, step: Step) -> Iterator[Optional[Record]]:
+        """
+        Measure the execution of a step and notify hooks. Yields None
+        (nothing is measured) if the run has no hooks.
+        """
+        fn_name = step.cell.fn.__name__
+        logger.debug(f"Workflow {self.wkf.name} running {fn_name}")
+        record = self.records.get(step.resource_name)
+        if record is None:
+            yield None
+            return
+
+        for hook in self.hooks:
+            hook.on_start(self, step)
+        # Calls made in another thread add their cpu time to the record
+        record.cpu_time = 0.0
+        start_time, start_cpu = perf_counter(), thread_time()
+        try:
+            yield record
+        except Exception as exc:
+            record.wall_time = perf_counter() - start_time
+            record.cpu_time += thread_time() - start_cpu
+            record.error = exc
+            for hook in self.hooks:
+                hook.on_error(self, step, exc)
+            raise
+        record.wall_time = perf_counter() - start_time
+        record.cpu_time += thread_time() - start_cpu
+
+        logger.debug(f"Call of {fn_name} took {record.wall_time:.3f}s")
+        for hook in self.hooks:
+            hook.on_end(self, step, record)
+
+    def bind(self, step: Step, kw: dict) -> tuple[dict, Optional[str | tuple], Any]:
+        """
+        Apply mutators and keep the parameters supported by the cell
+        function. Returns those, the key of the step in its cache (see
+        `cache_of`) and the cached value (MISSING if not found).
+        """
+        self.mutate(step, kw)
+        kw = step.cell.call_plan.kwargs(kw)
+        key = self.cache_key(step, kw)
+        if key is None:
+            return kw, None, MISSING
+        if step.cell.cache is None:
+            # Results expiring from a cell cache are not identified by
+            # their key
+            for name in step.outputs():
+                self.keys[name] = key
+            self.keys[step.resource_name] = key
+        if step.cell.cache is None:
+            res = self.wkf.cache.get(key, MISSING)
+        else:
+            res, stale = step.cell.cache.lookup(key)
+            if stale:
+                self.revalidate(step, kw, key)
+        if res is not MISSING:
+            logger.debug(f"{step.resource_name} loaded from cache")
+            if step.resource_name in self.records:
+                self.records[step.resource_name].cached = True
+        return kw, key, res
+
+    def save(self, step: Step, key: Optional[str | tuple], res: Any):
+        if key is not None:
+            self.cache_of(step).set(key, res)
+
+    def cache_of(self, step: Step) -> Optional[DiskCache | MemoryCache | TTLCache]:
+        """
+        Cache of the results of step: the cell cache if the cell has a
+        cache policy, the workflow persistent cache otherwise.
+        """
+        if step.cell.cache is not None:
+            return step.cell.cache
+        return self.wkf.cache
+
+    def cache_key(self, step: Step, kw: dict) -> Optional[str | tuple]:
+        """
+        Key of the step in its cache (if any), based on the parameters
+        actually passed to the cell function. The results of dependencies
+        are identified by their own key if they have one, instead of
+        being pickled.
+        """
+        cache = self.cache_of(step)
+        if cache is None or step.cell.stream:
+            return None
+        params = kw
+        for alias, dependency in step.dependencies.items():
+            upstream = self.keys.get(dependency)
+            if upstream is None or alias not in kw or alias in step.cell.mutators:
+                continue
+            if params is kw:
+                params = dict(kw)
+            params[alias] = Upstream(dependency, upstream)
+        return cache.key(step.resource_name, step.cell.fn, params)
+
+    def revalidate(self, step: Step, kw: dict, key: tuple):
+        """
+        Recompute a stale result in the background, the stale value is
+        used in the meantime. The call applies the policies of the cell
+        (retries, timeout and single flight) but not the deadline nor
+        the cancellation of the current run, that it may outlive.
+        Coroutine cells are executed in their own event loop.
+        """
+        logger.debug(f"{step.resource_name} is stale, refreshing it")
+        cell = step.cell
+        if cell.batch:
+            kw = {name: [value] for name, value in kw.items()}
+        run = Run(self.wkf, _executor=self.executor)
+
+        def compute():
+            if iscoroutinefunction(cell.fn):
+                import asyncio
+
+                res = asyncio.run(run.acall(step, kw))
+            else:
+                res = run.call(step, kw)
+            return res[0] if cell.batch else res
+
+        cell.cache.refresh(key, compute)
+
+    def hit(self, resource_name: str):
+        self.hits += 1
+        if resource_name in self.records:
+            self.records[resource_name].hits += 1
+
+    def mutate(self, step: Step, kw: dict):
+        """
+        Apply mutators of the cell on kw (in-place)
+        """
+        for alias, call_plan in step.cell.mutators.items():
+            kw[alias] = call_plan(kw)
+
+    def store(self, step: Step, res: Any) -> Any:
+        """
+        Cache the result of a cell call and return the value of the
+        resource
+        """
+        cell, match = step.cell, step.match
+        if cell.keep:
+            self.retained.update(step.outputs())
+            self.retained.add(step.resource_name)
+        # Cache & return simple cell, its size is already measured if
+        # the step is recorded
         if len(cell.patterns) == 1:
-            self.cache[resource_name] = res
+            record = self.records.get(step.resource_name)
+            self.hold(step.resource_name, res, record and record.size)
             return res
 
         # If a cell contains multiple patterns (multi-provide
         # decorator), extract the relevant one
         assert isinstance(res, tuple)
-        for pattern, pattern_res in zip(cell.patterns, res):
-            self.cache[pattern.fmt(match.kw)] = pattern_res
+        for name, pattern_res in zip(step.outputs(), res):
+            self.hold(name, pattern_res)
         raw_patterns = [p.pattern for p in cell.patterns]
-        return res[raw_patterns.index(match.route)]
+        value = res[raw_patterns.index(match.route)]
+        self.hold(step.resource_name, value)
+        return value
+
+    def hold(self, resource_name: str, value: Any, size: Optional[int] = None):
+        """
+        Add value to the run cache and update the memory counters (if
+        sizes are measured), size is measured if not given.
+        """
+        self.forget(resource_name)
+        self.cache[resource_name] = value
+        if not (self.measure or self.hooks):
+            return
+        if size is None:
+            size = size_of(value)
+        self.sizes[resource_name] = size
+        self.memory += size
+        self.peak_memory = max(self.peak_memory, self.memory)
+        if self.max_bytes is not None and self.memory > self.max_bytes:
+            self.spill()
+
+    def forget(self, resource_name: str):
+        """
+        Remove a result from the run cache
+        """
+        self.cache.pop(resource_name, None)
+        self.memory -= self.sizes.pop(resource_name, 0)
+
+    def load(self, resource_name: str) -> Any:
+        """
+        Return a result from the run cache or from the spill cache
+        """
+        if resource_name in self.spilled:
+            return self.unspill(resource_name, self.spilled[resource_name])
+        return self.cache[resource_name]
+
+    def unspill(self, resource_name: str, key: str) -> Any:
+        """
+        Read a spilled result, raises KeyError if it is not found in the
+        spill cache anymore.
+        """
+        value = self.spill_cache.get(key, MISSING)
+        if value is MISSING:
+            msg = f"Spilled result of {resource_name} not found in {self.spill_cache.path}"
+            raise KeyError(msg)
+        return value
+
+    def consumed(self, step: Step):
+        """
+        Evict the dependencies of a completed step that are not needed
+        anymore, and its outputs that no step needs.
+        """
+        for name in step.dependencies.values():
+            if name in self.consumers:
+                self.consumers[name] -= 1
+                if not self.consumers[name]:
+                    self.release(name)
+        for name in {*step.outputs(), step.resource_name}:
+            if not self.consumers.get(name):
+                self.release(name)
+
+    def release(self, resource_name: str):
+        """
+        Drop a result without consumers, unless it is retained (a
+        spilled retained result is loaded back).
+        """
+        key = self.spilled.pop(resource_name, None)
+        if resource_name in self.retained:
+            if key is not None:
+                self.hold(resource_name, self.unspill(resource_name, key))
+                self.spill_cache.remove(key)
+            return
+        if key is not None:
+            self.spill_cache.remove(key)
+        self.forget(resource_name)
+
+    def spill(self):
+        """
+        Move results waiting for their consumers to the spill cache,
+        largest first, until the memory held by the run is below
+        `max_bytes`.
+        """
+        if self.spill_cache is None:
+            return
+        waiting = [name for name in self.cache if self.consumers.get(name)]
+        for name in sorted(waiting, key=lambda n: -self.sizes[n]):
+            if self.memory <= self.max_bytes:
+                break
+            key = sha256(f"{self.id}:{name}".encode()).hexdigest()
+            self.spill_cache.set(key, self.cache[name])
+            if key not in self.spill_cache:
+                # Value can not be pickled
+                continue
+            logger.debug(f"{name} spilled to {self.spill_cache.path}")
+            self.spilled[name] = key
+            self.forget(name)
+
+
+class Session(Run):
+    """
+    Run keeping its results between calls of `run`. Each result records
+    the parameters consumed by its cell (and its mutators and dependency
+    patterns) and the version of its dependencies. A cached result is
+    only recomputed if one of those changed or if its cell has been
+    replaced in the workflow. Results are never evicted.
+    """
+
+    def __init__(self, wkf, **extra_kw):
+        super().__init__(wkf, **extra_kw)
+        self.reject_eviction("Sessions")
+        self.session_kw = extra_kw
+        # {resource name: (cell, fn, inputs, dependency versions)}
+        self.entries = {}
+        self.versions = defaultdict(int)
+        # Inputs of the prepared steps
+        self.inputs = {}
+        # Resources known to be fresh during the current call of run
+        self.checked = set()
+
+    def run(self, *resource_name: str, **extra_kw):
+        """
+        Resolve the given resources, reusing results that are still
+        fresh. Parameters given here override the session ones for this
+        call only.
+        """
+        options = [name for name in EVICTION_OPTIONS if name in extra_kw]
+        if options:
+            msg = f"Sessions do not support the {', '.join(options)} options"
+            raise ValueError(msg)
+        self.extra_kw = {**self.session_kw, **extra_kw}
+        self.checked = set()
+        # A cancelled session resumes from the results already computed
+        self.cancelled.clear()
+        if self.timeout is not None:
+            self.deadline = perf_counter() + self.timeout
+        results = tuple(self.resolve(name) for name in resource_name)
+        if len(results) == 1:
+            return results[0]
+        return results
+
+    def lookup(self, resource_name: str) -> Any:
+        if resource_name in self.cache and resource_name not in self.checked:
+            self.refresh(resource_name)
+        return super().lookup(resource_name)
+
+    def refresh(self, resource_name: str):
+        """
+        Drop the cached results that are not fresh anymore among
+        resource_name and its dependencies (dependencies first). An
+        explicit stack is used, like in `resolve`.
+        """
+        stack = [resource_name]
+        expanded = set()
+        while stack:
+            name = stack[-1]
+            if name in self.checked or name not in self.cache:
+                stack.pop()
+                continue
+            if name not in expanded:
+                expanded.add(name)
+                _, _, _, versions = self.entries[name]
+                stack.extend(versions)
+                continue
+            stack.pop()
+            if not self.is_fresh(name):
+                self.invalidate(name)
+            self.checked.add(name)
+
+    def is_fresh(self, resource_name: str) -> bool:
+        """
+        True if the cell, the inputs and the dependencies of a cached
+        result did not change (dependencies must be checked first: a
+        stale one is not cached anymore).
+        """
+        cell, fn, inputs, versions = self.entries[resource_name]
+        value = self.cache[resource_name]
+        if isinstance(value, Stream) and value.consumed:
+            # Streams can only be consumed once
+            return False
+        step = self.prepare(resource_name)
+        if step.cell is not cell or cell.fn is not fn:
+            return False
+        if not same_values(self.inputs[resource_name], inputs):
+            return False
+        for dependency, version in versions.items():
+            if dependency not in self.cache:
+                return False
+            if self.versions[dependency] != version:
+                return False
+        return True
+
+    def invalidate(self, *resource_names: str):
+        """
+        Drop the given results and the ones depending on them.
+        """
+        dependents = defaultdict(list)
+        for name, (_, _, _, versions) in self.entries.items():
+            for dependency in versions:
+                dependents[dependency].append(name)
+
+        todo = list(resource_names)
+        while todo:
+            name = todo.pop()
+            if name not in self.cache:
+                continue
+            self.forget(name)
+            self.entries.pop(name, None)
+            todo.extend(dependents[name])
+
+    def prepare(self, resource_name: str) -> Step:
+        step = super().prepare(resource_name)
+        cell = step.cell
+        if cell.call_plan is not None and cell.call_plan.has_var_kw:
+            names = step.kw
+        else:
+            names = set(cell.call_plan.names if cell.call_plan else ())
+            for call_plan in cell.mutators.values():
+                names.update(call_plan.names)
+            for pattern in cell.dependencies.values():
+                names.update(f.field_name for f in pattern.fields if f.field_name)
+        aliases = set(cell.dependencies) | set(cell.mutators)
+        self.inputs[resource_name] = {
+            name: step.kw.get(name, MISSING) for name in names if name not in aliases
+        }
+        return step
+
+    def store(self, step: Step, res: Any) -> Any:
+        value = super().store(step, res)
+        versions = {dep: self.versions[dep] for dep in step.dependencies.values()}
+        entry = (step.cell, step.cell.fn, self.inputs[step.resource_name], versions)
+        for name in {*step.outputs(), step.resource_name}:
+            self.versions[name] += 1
+            self.entries[name] = entry
+            self.checked.add(name)
+        return value
+
+
+class Plan:
+    """
+    Concrete graph of the resources needed to resolve a set of targets:
+    the steps (matched cell, parameters and dependency names) of all
+    those resources, as built by `Workflow.plan`.
+    """
+
+    def __init__(
+        self, wkf, targets: Iterable[str], steps: dict[str, Step], extra_kw: dict
+    ):
+        self.wkf = wkf
+        self.targets = tuple(targets)
+        self.steps = steps
+        self.extra_kw = extra_kw
+
+    def order(self) -> list[Step]:
+        """
+        Unique steps, dependencies first
+        """
+        order = []
+        seen = set()
+        todo = [(name, False) for name in reversed(self.targets)]
+        while todo:
+            name, done = todo.pop()
+            step = self.steps[name]
+            if done:
+                order.append(step)
+                continue
+            if id(step) in seen:
+                continue
+            seen.add(id(step))
+            todo.append((name, True))
+            todo.extend(
+                (dep, False)
+                for dep in reversed(step.dependencies.values())
+                if dep in self.steps
+            )
+        return order
+
+    def make_run(self, _executor: Optional[Executor] = None, **options) -> "Run":
+        run = Run(self.wkf, _executor=_executor, **options, **self.extra_kw)
+        run.prepared = self.steps
+        return run
+
+    def run(self, _executor: Optional[Executor] = None, **options):
+        """
+        Execute the plan, sequentially or with the given executor.
+        Options are the reserved run parameters (`_evict`, ...).
+        """
+        run = self.make_run(_executor, **options)
+        results = tuple(run.resolve_all(self.targets))
+        if len(results) == 1:
+            return results[0]
+        return results
+
+    async def arun(self, _executor: Optional[Executor] = None, **options):
+        """
+        Execute the plan in the running event loop (eviction options are
+        not supported)
+        """
+        import asyncio
+
+        run = self.make_run(_executor, **options)
+        run.reject_eviction("Asynchronous runs")
+        results = await asyncio.gather(*(run.aresolve(n) for n in self.targets))
+        if len(results) == 1:
+            return results[0]
+        return tuple(results)
+
+    def explain(self) -> str:
+        """
+        Describe the steps of the plan, dependencies first
+        """
+        lines = [f"Plan of workflow {self.wkf.name}: {', '.join(self.targets)}"]
+        for step in self.order():
+            outputs = [name for name in step.outputs() if name != step.resource_name]
+            line = f"{step.resource_name} <- {step.cell.fn.__name__}"
+            if outputs:
+                line += f" (also provides {', '.join(outputs)})"
+            lines.append(line)
+            for alias, dependency in step.dependencies.items():
+                lines.append(f"    {alias} = {dependency}")
+            params = step.cell.call_plan.kwargs(step.kw)
+            for name, value in params.items():
+                lines.append(f"    {name} := {value!r}")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        """
+        Return the plan as plain python objects (json serializable if
+        the parameters are), see `from_dict`.
+        """
+        return {
+            "workflow": self.wkf.name,
+            "targets": list(self.targets),
+            "kw": self.extra_kw,
+            "steps": [
+                {
+                    "resource": step.resource_name,
+                    "route": step.match.route,
+                    "match": dict(step.match.kw),
+                    "kw": step.kw,
+                    "dependencies": step.dependencies,
+                }
+                for step in self.order()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, wkf: Optional["Workflow"] = None) -> "Plan":
+        """
+        Rebuild a plan returned by `to_dict`, cells are found by route
+        in the given workflow (or the registered one with the same
+        name).
+        """
+        wkf = wkf or Workflow.get(data["workflow"])
+        if wkf is None:
+            raise KeyError(f"Workflow {data['workflow']} not found")
+        steps = {}
+        for item in data["steps"]:
+            if item["route"] not in wkf.router.routes:
+                raise KeyError(
+                    f"Route {item['route']} not found in workflow {wkf.name}"
+                )
+            _, cell = wkf.router.routes[item["route"]]
+            match = Match(item["route"], cell, dict(item["match"]))
+            step = Step(
+                item["resource"], match, dict(item["kw"]), dict(item["dependencies"])
+            )
+            for output in step.outputs():
+                steps.setdefault(output, step)
+            steps[step.resource_name] = step
+        return cls(wkf, data["targets"], steps, dict(data["kw"]))
+
+
+def same_values(left: dict, right: dict) -> bool:
+    """
+    Compare parameter dicts, values that can not be compared (like
+    numpy arrays) are only equal if they are the same object.
+    """
+    if left.keys() != right.keys():
+        return False
+    for key, value in left.items():
+        other = right[key]
+        if value is other:
+            continue
+        try:
+            if not bool(value == other):
+                return False
+        except Exception:
+            return False
+    return True
 
 
 # Define shortcuts
@@ -287,59 +1857,166 @@ def bind(fn: Callable, args=None, kw=None):
     args = args or []
     kw = kw or {}
 
-    # Inspect function parameters
-    params = signature(fn).parameters
-    has_var_kw = any(p.kind == p.VAR_KEYWORD for p in params.values())
-    positionals = {}
-    for pos, p in enumerate(params.values()):
-        if p.default is Signature.empty:
-            positionals[p.name] = pos
-    in_pos = lambda n: n in positionals and positionals[n] < len(args)
-
-    # Filter out uneeded parameters
-    partial_kw = {}
-    for name, value in kw.items():
-        if name not in params and not has_var_kw:
-            # Skip unsupported params
-            continue
-        if in_pos(name):
-            # This param is already defined in args
-            continue
-
-        # Add value to partial_kw
-        partial_kw[name] = value
-
+    partial_kw = CallPlan(fn).kwargs(kw, nargs=len(args))
     if not (args or partial_kw):
         return fn
 
     return partial(fn, *args, **partial_kw)
 
 
-def rformat(cfg: list | dict | str, **kw):
+class CallPlan:
+    """
+    Inspect the signature of a function once, so that it can be called
+    repeatedly with a dict containing (a superset of) its parameters.
+    """
+
+    def __init__(self, fn: Callable):
+        self.fn = fn
+        params = signature(fn).parameters
+        self.names = tuple(params)
+        self.has_var_kw = any(p.kind == p.VAR_KEYWORD for p in params.values())
+        self.positionals = {}
+        for pos, p in enumerate(params.values()):
+            if p.default is Signature.empty:
+                self.positionals[p.name] = pos
+
+    def kwargs(self, kw: dict, nargs: int = 0) -> dict:
+        """
+        Filter out parameters not supported by the function, and the ones
+        already given by the first `nargs` positional arguments.
+        """
+        if self.has_var_kw:
+            res = dict(kw)
+        else:
+            res = {name: kw[name] for name in self.names if name in kw}
+        if nargs:
+            for name, pos in self.positionals.items():
+                if pos < nargs:
+                    res.pop(name, None)
+        return res
+
+    def __call__(self, kw: dict) -> Any:
+        return self.fn(**self.kwargs(kw))
+
+
+def rformat(cfg: "list | dict | str | Template", **kw):
     """
-    Recursively format content of cfg with kw (in-place!)
+    Recursively format content of cfg with kw (cfg is not modified)
     """
+    if isinstance(cfg, Template):
+        return cfg.fmt(kw)
+
     # Dict: handle keys and values
     if isinstance(cfg, dict):
-        for key in list(cfg):
-            if (fmt_key := rformat(key, **kw)) != key:
-                cfg[fmt_key] = cfg.pop(key)
-
-        for key, value in cfg.items():
-            cfg[key] = rformat(value, **kw)
+        return {rformat(key, **kw): rformat(value, **kw) for key, value in cfg.items()}
     # List
     if isinstance(cfg, list):
-        cfg = [rformat(cell, **kw) for cell in cfg]
+        return [rformat(cell, **kw) for cell in cfg]
 
     # Simple string
     if isinstance(cfg, str):
         ptrn = Pattern.from_string(cfg)
-        cfg = ptrn.fmt(kw)
+        return ptrn.fmt(kw)
 
     return cfg
 
 
-@dataclass
+class Template:
+    """
+    Config entry whose strings (dict keys included) are parsed once
+    into patterns, so that formatting it only joins strings.
+
+    Formatted entries are memoized per parameters and shared between
+    runs: a dict entry is returned as a read-only mapping, and its
+    nested lists and dicts are copied (so that a cell modifying them
+    does not affect the other runs).
+    """
+
+    def __init__(self, value: Any):
+        self.value = value
+        self.parsed = self.parse(value)
+        self.static = not self.has_fields(self.parsed)
+        self.nested = self.has_containers(value)
+        self._fmt_items = lru_cache(maxsize=1024)(self._fmt_items)
+
+    @classmethod
+    def parse(cls, value):
+        if isinstance(value, dict):
+            return {
+                Pattern.from_string(k) if isinstance(k, str) else k: cls.parse(v)
+                for k, v in value.items()
+            }
+        if isinstance(value, list):
+            return [cls.parse(item) for item in value]
+        if isinstance(value, str):
+            return Pattern.from_string(value)
+        return value
+
+    @classmethod
+    def has_fields(cls, parsed) -> bool:
+        if isinstance(parsed, dict):
+            return any(
+                cls.has_fields(k) or cls.has_fields(v) for k, v in parsed.items()
+            )
+        if isinstance(parsed, list):
+            return any(cls.has_fields(item) for item in parsed)
+        if isinstance(parsed, Pattern):
+            return parsed.literal is None
+        return False
+
+    @classmethod
+    def has_containers(cls, value) -> bool:
+        """
+        True if value contains lists or dicts (value itself excluded)
+        """
+        if isinstance(value, dict):
+            value = value.values()
+        elif not isinstance(value, list):
+            return False
+        return any(isinstance(item, (list, dict)) for item in value)
+
+    @classmethod
+    def copy(cls, value):
+        if isinstance(value, dict):
+            return {k: cls.copy(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [cls.copy(item) for item in value]
+        return value
+
+    def fmt(self, kw: dict) -> Any:
+        if self.static:
+            res = self.value
+        else:
+            try:
+                res = self._fmt_items(tuple(kw.items()))
+            except TypeError:
+                # Unhashable parameters
+                res = self._fmt(self.parsed, kw)
+        if self.nested:
+            res = self.copy(res)
+        if isinstance(res, dict):
+            return MappingProxyType(res)
+        return res
+
+    def _fmt_items(self, items: tuple) -> Any:
+        return self._fmt(self.parsed, dict(items))
+
+    @classmethod
+    def _fmt(cls, parsed, kw):
+        if isinstance(parsed, dict):
+            return {cls._fmt(k, kw): cls._fmt(v, kw) for k, v in parsed.items()}
+        if isinstance(parsed, list):
+            return [cls._fmt(item, kw) for item in parsed]
+        if isinstance(parsed, Pattern):
+            return parsed.fmt(kw)
+        return parsed
+
+
+# Validators of pattern specifiers
+VALUE_REGEXES = {name: re.compile(ptrn) for name, ptrn in VALUE_PATTERNS.items()}
+
+
+@dataclass(frozen=True)
 class PatternField:
     literal_text: str
     field_name: Optional[str]
@@ -352,8 +2029,7 @@ class PatternField:
         suffix = kw[self.field_name]
         if self.specifier:
             # If provided, enforce specifier
-            regexp = re.compile(VALUE_PATTERNS[self.specifier])
-            if not regexp.match(suffix):
+            if not VALUE_REGEXES[self.specifier].match(suffix):
                 msg = f"Parameter '{self.field_name}' does not match specifier '{self.specifier}'"
                 raise InvalidValue(msg)
         return res + suffix
@@ -366,15 +2042,26 @@ class Pattern:
     def __init__(self, pattern: str, *fields: PatternField):
         self.pattern = pattern
         self.fields = fields
+        # Formatted value of patterns without fields
+        self.literal = None
+        if all(f.field_name is None for f in fields):
+            self.literal = "".join(f.literal_text for f in fields)
 
     @classmethod
+    @lru_cache(maxsize=4096)
     def from_string(cls, pattern: str) -> "Pattern":
+        """
+        Parse the given string, parsed patterns are cached (and shared),
+        they must not be modified.
+        """
         fields = []
         for literal_text, field_name, specifier, _ in cls.formatter.parse(pattern):
             fields.append(PatternField(literal_text, field_name, specifier))
         return Pattern(pattern, *fields)
 
     def fmt(self, kw):
+        if self.literal is not None:
+            return self.literal
         return "".join(f.fmt(kw) for f in self.fields)
 
     def __repr__(self):
@@ -0,0 +1,98 @@
+import asyncio
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from interlinked import Workflow
+from interlinked.exceptions import LoopException
+
+LOGS = defaultdict(int)
+wkf = Workflow("test-async")
+
+
+@wkf.provide("fetch.{name}")
+async def fetch(name):
+    LOGS[name] += 1
+    await asyncio.sleep(0.01)
+    return name
+
+
+@wkf.provide("sync.{name}")
+def sync(name):
+    LOGS["sync"] += 1
+    return name.upper()
+
+
+@wkf.depend(first="fetch.{name}", second="fetch.{name}", third="sync.{name}")
+@wkf.provide("combine.{name}")
+async def combine(first, second, third):
+    return first + second + third
+
+
+@wkf.depend(left="combine.{name}", right="fetch.{name}")
+@wkf.provide("top.{name}")
+def top(left, right):
+    return left + right
+
+
+def test_arun():
+    res = asyncio.run(wkf.arun("top.ham"))
+    assert res == "hamhamHAMham"
+    # Shared dependencies are only awaited once
+    assert LOGS == {"ham": 1, "sync": 1}
+    LOGS.clear()
+
+
+def test_arun_executor():
+    async def main():
+        with ThreadPoolExecutor(2) as pool:
+            return await wkf.arun("top.ham", "sync.spam", _executor=pool)
+
+    assert asyncio.run(main()) == ("hamhamHAMham", "SPAM")
+    LOGS.clear()
+
+
+def test_concurrent_runs():
+    async def main():
+        runs = [wkf.arun(f"fetch.n{i}") for i in range(100)]
+        return await asyncio.gather(*runs)
+
+    res = asyncio.run(main())
+    assert res == [f"n{i}" for i in range(100)]
+    assert len(LOGS) == 100
+    LOGS.clear()
+
+
+def test_error():
+    loopy = Workflow("test-async-loopy")
+
+    @loopy.depend(value="second")
+    @loopy.provide("first")
+    async def first(value):
+        return value
+
+    @loopy.depend(value="first")
+    @loopy.provide("second")
+    async def second(value):
+        return value
+
+    # The loop is entered from both sides at once
+    @loopy.depend(left="first", right="second")
+    @loopy.provide("both")
+    async def both(left, right):
+        return left
+
+    @loopy.provide("fail")
+    async def fail():
+        raise ValueError("fail")
+
+    async def main(name):
+        # Fail instead of hanging
+        return await asyncio.wait_for(loopy.arun(name), timeout=5)
+
+    for name in ("first", "both"):
+        with pytest.raises(LoopException):
+            asyncio.run(main(name))
+    with pytest.raises(ValueError):
+        asyncio.run(main("fail"))
@@ -0,0 +1,63 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from interlinked import Workflow
+
+LOGS = defaultdict(int)
+wkf = Workflow("test-batch")
+
+
+@wkf.provide("offset")
+def offset():
+    LOGS["offset"] += 1
+    return 10
+
+
+@wkf.depend(offset="offset")
+@wkf.provide("temperature_{city}", batch=True)
+def temperature(city, offset):
+    # Parameters are given as lists, one item per resource
+    LOGS["temperature"] += 1
+    return [len(c) + o for c, o in zip(city, offset)]
+
+
+@wkf.depend(temp="temperature_{city}")
+@wkf.provide("report_{city}")
+def report(city, temp, unit="C"):
+    LOGS["report"] += 1
+    return f"{city}: {temp}{unit}"
+
+
+def test_run_many():
+    cities = ["paris", "brussels", "rome", "paris"]
+    res = wkf.run_many([f"temperature_{c}" for c in cities])
+    assert res == {
+        "temperature_paris": 15,
+        "temperature_brussels": 18,
+        "temperature_rome": 14,
+    }
+    # Shared dependency computed once, one call for the whole batch
+    assert LOGS == {"offset": 1, "temperature": 1}
+    LOGS.clear()
+
+
+def test_iter_many():
+    cities = ["paris", "brussels", "rome"]
+    with ThreadPoolExecutor(2) as pool:
+        res = list(
+            wkf.iter_many([f"report_{c}" for c in cities], _executor=pool, unit="K")
+        )
+    assert sorted(res) == [
+        ("report_brussels", "brussels: 18K"),
+        ("report_paris", "paris: 15K"),
+        ("report_rome", "rome: 14K"),
+    ]
+    assert LOGS == {"offset": 1, "temperature": 1, "report": 3}
+    LOGS.clear()
+
+
+def test_single_run():
+    # Batch cells can also be resolved one by one
+    assert wkf.run("report_paris") == "paris: 15C"
+    assert LOGS == {"offset": 1, "temperature": 1, "report": 1}
+    LOGS.clear()
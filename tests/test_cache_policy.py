@@ -0,0 +1,139 @@
+from collections import defaultdict
+from threading import Event
+import asyncio
+
+from interlinked import Workflow
+
+LOGS = defaultdict(int)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_workflow(name, **policy):
+    wkf = Workflow(name)
+
+    @wkf.provide("rates.{ccy}", **policy)
+    def rates(ccy, base="eur"):
+        LOGS[ccy] += 1
+        return f"{base}/{ccy}:{LOGS[ccy]}"
+
+    @wkf.depend(rate="rates.{ccy}")
+    @wkf.provide("price.{ccy}")
+    def price(rate, amount=1):
+        LOGS["price"] += 1
+        return f"{amount} {rate}"
+
+    clock = Clock()
+    wkf.by_name("rates.usd").value.cache.clock = clock
+    return wkf, clock
+
+
+def test_ttl():
+    wkf, clock = make_workflow("test-cache-policy-ttl", ttl=10)
+    assert wkf.run("price.usd") == "1 eur/usd:1"
+    # Reused by the following runs, cells without policy are recomputed
+    assert wkf.run("price.usd", amount=2) == "2 eur/usd:1"
+    assert wkf.run("price.usd", base="chf") == "1 chf/usd:2"
+    assert dict(LOGS) == {"usd": 2, "price": 3}
+
+    # Expired
+    clock.now = 10
+    assert wkf.run("price.usd") == "1 eur/usd:3"
+    clock.now = 19
+    assert wkf.run("price.usd") == "1 eur/usd:3"
+    assert LOGS["usd"] == 3
+
+    # Shared by clones
+    assert wkf.kw(amount=3).run("price.usd") == "3 eur/usd:3"
+    assert LOGS["usd"] == 3
+    LOGS.clear()
+
+
+def test_max_entries():
+    wkf, clock = make_workflow("test-cache-policy-max-entries", max_entries=2)
+    cache = wkf.by_name("rates.usd").value.cache
+    for ccy in ("usd", "chf", "usd", "gbp"):
+        wkf.run(f"rates.{ccy}")
+    assert len(cache) == 2
+    # No ttl, only the least recently used (chf) is dropped
+    clock.now = 1e9
+    for ccy in ("usd", "gbp", "chf"):
+        wkf.run(f"rates.{ccy}")
+    assert dict(LOGS) == {"usd": 1, "chf": 2, "gbp": 1}
+    LOGS.clear()
+
+
+def test_stale_while_revalidate():
+    wkf, clock = make_workflow("test-cache-policy-stale", ttl=10, stale=5)
+    cache = wkf.by_name("rates.usd").value.cache
+    assert wkf.run("rates.usd") == "eur/usd:1"
+
+    # Stale value is returned and refreshed in the background
+    clock.now = 12
+    assert wkf.run("rates.usd") == "eur/usd:1"
+    while cache.refreshing:
+        Event().wait(0.01)
+    assert LOGS["usd"] == 2
+    assert wkf.run("rates.usd") == "eur/usd:2"
+
+    # Too old to be served
+    clock.now = 40
+    assert wkf.run("rates.usd") == "eur/usd:3"
+    assert LOGS["usd"] == 3
+    LOGS.clear()
+
+
+def test_invalidate():
+    wkf, clock = make_workflow("test-cache-policy-invalidate", ttl=60)
+    wkf.run_many(["rates.usd", "rates.chf", "rates.gbp"])
+    assert wkf.invalidate("rates.usd") == 1
+    assert wkf.run("rates.usd") == "eur/usd:2"
+    assert wkf.run("rates.chf") == "eur/chf:1"
+
+    assert wkf.invalidate("rates.{ccy}") == 3
+    assert wkf.run("rates.chf") == "eur/chf:2"
+    assert wkf.invalidate("price.{ccy}") == 0
+    LOGS.clear()
+
+
+def test_async():
+    wkf = Workflow("test-cache-policy-async")
+    calls = []
+
+    @wkf.provide("model.{name}", ttl=60)
+    async def model(name):
+        calls.append(name)
+        return name.upper()
+
+    assert asyncio.run(wkf.arun("model.ham")) == "HAM"
+    assert asyncio.run(wkf.arun("model.ham")) == "HAM"
+    assert calls == ["ham"]
+
+
+def test_stale_async_retries():
+    wkf = Workflow("test-cache-policy-stale-async")
+    calls = []
+
+    @wkf.provide("model", ttl=10, stale=5, retries=1)
+    async def model():
+        calls.append(None)
+        if len(calls) == 2:
+            raise ConnectionError("try again")
+        return len(calls)
+
+    cache = wkf.by_name("model").value.cache
+    clock = cache.clock = Clock()
+    assert asyncio.run(wkf.arun("model")) == 1
+
+    # The refresh is retried like any call of the cell
+    clock.now = 12
+    assert asyncio.run(wkf.arun("model")) == 1
+    while cache.refreshing:
+        Event().wait(0.01)
+    assert asyncio.run(wkf.arun("model")) == 3
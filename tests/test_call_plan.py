@@ -0,0 +1,27 @@
+from interlinked.workflow import CallPlan, bind
+
+
+def fn(a, b, c=3):
+    return a, b, c
+
+
+def var_kw(a, **kw):
+    return a, kw
+
+
+def test_call_plan():
+    plan = CallPlan(fn)
+    kw = {"a": 1, "b": 2, "d": 4}
+    assert plan.kwargs(kw) == {"a": 1, "b": 2}
+    assert plan(kw) == (1, 2, 3)
+    # Positional slots are skipped
+    assert plan.kwargs(kw, nargs=1) == {"b": 2}
+
+    plan = CallPlan(var_kw)
+    assert plan(kw) == (1, {"b": 2, "d": 4})
+
+
+def test_bind():
+    assert bind(fn, kw={"a": 1, "b": 2, "z": 0})() == (1, 2, 3)
+    assert bind(fn, [0], kw={"a": 1, "b": 2})() == (0, 2, 3)
+    assert bind(fn) is fn
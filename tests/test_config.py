@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
 from interlinked import Workflow
@@ -87,3 +89,61 @@ def fmt_invalid_spec_echo(fmt_param):
 def test_fmt_invalid_spec_param_from_conf():
     with pytest.raises(InvalidValue):
         wkf4.run("hello.spam")
+
+
+# Config resolution does not modify the config
+cfg5 = {
+    "hello.{world:identifier}": {
+        "fmt_param": "from conf ({world})",
+        "nested": {"{world}": ["{world}"]},
+    },
+}
+wkf5 = Workflow("My pure fmt workflow", config=cfg5)
+
+
+@wkf5.provide("hello.{world}")
+def nested_echo(fmt_param, nested):
+    return fmt_param, nested
+
+
+def test_config_not_modified():
+    assert wkf5.run("hello.spam") == ("from conf (spam)", {"spam": ["spam"]})
+    assert wkf5.run("hello.ham") == ("from conf (ham)", {"ham": ["ham"]})
+    assert cfg5["hello.{world:identifier}"] == {
+        "fmt_param": "from conf ({world})",
+        "nested": {"{world}": ["{world}"]},
+    }
+
+    # Formatted entries are read-only, nested values are copies
+    template = wkf5.config_router.get("hello.spam")
+    entry = template.fmt({"world": "spam"})
+    assert entry["nested"] == template.fmt({"world": "spam"})["nested"]
+    assert entry["nested"] is not template.fmt({"world": "spam"})["nested"]
+    with pytest.raises(TypeError):
+        entry["fmt_param"] = "other"
+
+
+cfg6 = {
+    "append.{world}": {"items": ["{world}"], "static": {"values": [1]}},
+}
+wkf6 = Workflow("test-config-append", config=cfg6)
+
+
+@wkf6.provide("append.{world}")
+def append(items, static):
+    items.append("x")
+    static["values"].append(2)
+    return list(items), list(static["values"])
+
+
+def test_nested_values_not_shared():
+    for _ in range(3):
+        assert wkf6.run("append.ham") == (["ham", "x"], [1, 2])
+    assert cfg6["append.{world}"] == {"items": ["{world}"], "static": {"values": [1]}}
+
+
+def test_config_concurrent_runs():
+    names = [f"name{i}" for i in range(50)]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda n: wkf5.run(f"hello.{n}")[0], names))
+    assert results == [f"from conf ({n})" for n in names]
@@ -0,0 +1,139 @@
+from collections import defaultdict
+import os
+import subprocess
+import sys
+import threading
+
+from interlinked import Workflow
+from interlinked.cache import DiskCache
+
+LOGS = defaultdict(int)
+
+
+def make_workflow(name, path, **cache_kw):
+    wkf = Workflow(name, cache=DiskCache(path, **cache_kw))
+
+    @wkf.provide("dataset-{name}")
+    def dataset(name, size=3, opts=None):
+        LOGS["dataset"] += 1
+        return [name] * size
+
+    @wkf.depend(dataset="dataset-{name}")
+    @wkf.provide("train-{name}")
+    def train(dataset):
+        LOGS["train"] += 1
+        return len(dataset)
+
+    return wkf
+
+
+def test_persist_across_runs(tmp_path):
+    wkf = make_workflow("test-disk-cache", tmp_path)
+    assert wkf.run("train-first") == 3
+    assert LOGS == {"dataset": 1, "train": 1}
+
+    # Same workflow defined again (eg: in a new process)
+    other = make_workflow("test-disk-cache-bis", tmp_path)
+    assert other.run("train-first") == 3
+    assert LOGS == {"dataset": 1, "train": 1}
+
+    # Distinct parameters
+    assert other.run("train-first", size=4) == 4
+    assert LOGS == {"dataset": 2, "train": 2}
+    # Unhashable parameters are supported
+    assert other.run("train-first", size=4, opts={"a": [1]}) == 4
+    assert LOGS == {"dataset": 3, "train": 3}
+    assert other.run("train-first", size=4, opts={"a": [1]}) == 4
+    assert LOGS == {"dataset": 3, "train": 3}
+    assert other.run("train-first", size=4, opts={"a": [2]}) == 4
+    assert LOGS == {"dataset": 4, "train": 4}
+    LOGS.clear()
+
+
+def test_dependency_key(tmp_path):
+    wkf = Workflow("test-disk-cache-dependency", cache=DiskCache(tmp_path))
+
+    @wkf.provide("lock")
+    def lock():
+        LOGS["lock"] += 1
+        return threading.Lock()
+
+    @wkf.depend(lock="lock")
+    @wkf.provide("top")
+    def top(lock):
+        LOGS["top"] += 1
+        return "top"
+
+    # Results of dependencies are identified by their key, they do not
+    # have to be pickled (the lock itself is not cached)
+    assert wkf.run("top") == "top"
+    assert wkf.run("top") == "top"
+    assert LOGS == {"lock": 2, "top": 1}
+    LOGS.clear()
+
+
+def test_stable_key():
+    # Sets are keyed in the same way by all processes
+    code = (
+        "from interlinked.cache import entry_key;"
+        "print(entry_key('res', len, {'tags': {'ham', 'spam', 'eggs', 'foo'}}))"
+    )
+    keys = set()
+    for seed in ("1", "2", "3"):
+        env = {**os.environ, "PYTHONHASHSEED": seed}
+        proc = subprocess.run(
+            [sys.executable, "-c", code], env=env, capture_output=True, text=True
+        )
+        keys.add(proc.stdout)
+    assert len(keys) == 1
+
+
+def test_code_change(tmp_path):
+    wkf = make_workflow("test-disk-cache-code", tmp_path)
+    wkf.run("train-first")
+
+    @wkf.provide("dataset-{name}", _override=True)
+    def dataset(name, size=3):
+        LOGS["dataset"] += 1
+        return [name] * (size + 1)
+
+    assert wkf.run("dataset-first") == ["first"] * 4
+    assert LOGS == {"dataset": 2, "train": 1}
+    LOGS.clear()
+
+
+def test_eviction(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=200)
+    for i in range(10):
+        cache.set(f"key-{i}", b"x" * 50)
+    assert sum(p.stat().st_size for p in tmp_path.iterdir()) <= 200
+    assert "key-9" in cache
+    assert "key-0" not in cache
+    assert cache.get("key-0") is None
+
+
+def test_default_change(tmp_path):
+    wkf = make_workflow("test-disk-cache-default", tmp_path)
+    assert wkf.run("dataset-first") == ["first"] * 3
+
+    @wkf.provide("dataset-{name}", _override=True)
+    def dataset(name, size=4):
+        return [name] * size
+
+    assert wkf.run("dataset-first") == ["first"] * 4
+    LOGS.clear()
+
+
+def test_unreadable_entry(tmp_path, monkeypatch):
+    cache = DiskCache(tmp_path)
+    (tmp_path / "corrupted.pkl").write_bytes(b"not a pickle")
+    assert cache.get("corrupted", "miss") == "miss"
+
+    # Entry evicted by another process after being read
+    cache.set("key", 1)
+
+    def utime(path):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr("os.utime", utime)
+    assert cache.get("key") == 1
@@ -0,0 +1,110 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from interlinked import Workflow
+from interlinked.cache import DiskCache
+from interlinked.profile import Hook
+from interlinked.workflow import Run
+
+SIZE = 10_000
+wkf = Workflow("test-eviction")
+
+
+@wkf.provide("block.0")
+def first():
+    return b"x" * SIZE
+
+
+for i in range(1, 5):
+
+    @wkf.depend(prev=f"block.{i - 1}")
+    @wkf.provide(f"block.{i}", keep=(i == 2))
+    def block(prev):
+        return prev[:-1] + b"y"
+
+
+@wkf.depend(left="block.0", right="block.4")
+@wkf.provide("both")
+def both(left, right):
+    return len(left) + len(right)
+
+
+@pytest.fixture(params=[False, True], ids=["sequential", "threads"])
+def executor(request):
+    if not request.param:
+        yield None
+        return
+    with ThreadPoolExecutor(2) as executor:
+        yield executor
+
+
+def test_evict(executor):
+    run = Run(wkf, _executor=executor, _evict=True)
+    (res,) = run.resolve_all(["block.4"])
+    assert res == b"x" * (SIZE - 1) + b"y"
+    # Kept and requested results
+    assert set(run.cache) == {"block.2", "block.4"}
+    # At most a result and its dependency at once (plus the kept one)
+    assert run.peak_memory == 3 * sys.getsizeof(res)
+
+    # Sizes are measured for hooks too
+    run = Run(wkf)
+    run.hooks.append(Hook())
+    run.resolve_all(["block.4"])
+    assert len(run.cache) == 5
+    assert run.peak_memory == 5 * sys.getsizeof(res)
+
+    # And not at all otherwise
+    run = Run(wkf)
+    run.resolve_all(["block.4"])
+    assert run.peak_memory == 0
+
+
+def test_spill(tmp_path):
+    spill = DiskCache(tmp_path)
+    run = Run(wkf, _evict=True, _spill=spill, _max_bytes=SIZE * 3 // 2)
+    assert dict(run.iter_many(["both", "block.3"])) == {
+        "both": 2 * SIZE,
+        "block.3": b"x" * (SIZE - 1) + b"y",
+    }
+    # block.0 was spilled while block.1 to block.4 were computed
+    assert run.peak_memory < 3 * sys.getsizeof(b"x" * SIZE)
+    assert not run.spilled
+    assert not list(tmp_path.iterdir())
+    assert set(run.cache) == {"block.2", "block.3", "both"}
+
+    run = Run(wkf, _evict=True)
+    run.resolve_all(["both", "block.3"])
+    assert run.peak_memory > 3 * sys.getsizeof(b"x" * SIZE)
+
+
+def test_spill_missing(tmp_path):
+    with pytest.raises(ValueError):
+        Run(wkf, _spill=DiskCache(tmp_path, max_bytes=SIZE), _max_bytes=SIZE)
+
+    class Clear(Hook):
+        # Spilled entries removed behind the run back
+        def on_start(self, run, step):
+            if step.resource_name == "block.4":
+                spill.clear()
+
+    spill = DiskCache(tmp_path)
+    run = Run(wkf, _evict=True, _spill=spill, _max_bytes=SIZE * 3 // 2)
+    run.hooks.append(Clear())
+    with pytest.raises(KeyError, match="block.0 not found"):
+        run.resolve_all(["both"])
+
+
+def test_unsupported(tmp_path):
+    # Eviction is only implemented by synchronous runs
+    for options in ({"_evict": True}, {"_spill": DiskCache(tmp_path)}):
+        with pytest.raises(ValueError, match="Asynchronous runs"):
+            asyncio.run(wkf.arun("block.4", **options))
+        with pytest.raises(ValueError, match="Asynchronous runs"):
+            asyncio.run(wkf.plan("block.4").arun(**options))
+        with pytest.raises(ValueError, match="Sessions"):
+            wkf.session(**options)
+    with pytest.raises(ValueError, match="_max_bytes"):
+        wkf.session().run("block.4", _max_bytes=SIZE)
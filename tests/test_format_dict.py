@@ -1,4 +1,4 @@
-from interlinked.workflow import rformat, set_config, provide, run
+from interlinked.workflow import rformat, set_config, provide, run, Pattern, Template
 
 
 def test_fmt_dict():
@@ -26,6 +26,24 @@ def test_fmt_combined():
     assert res == {"ham-SPAM": ["foo-BAR", {"ham": "SPAM"}]}
 
 
+def test_fmt_template():
+    cfg = {"ham-{spam}": ["foo-{bar}", {"ham": "{spam}"}, 1], "static": "text"}
+    template = Template(cfg)
+    res = rformat(template, spam="SPAM", bar="BAR")
+    assert res == {"ham-SPAM": ["foo-BAR", {"ham": "SPAM"}, 1], "static": "text"}
+    # Template content is not modified
+    assert template.value == {
+        "ham-{spam}": ["foo-{bar}", {"ham": "{spam}"}, 1],
+        "static": "text",
+    }
+    assert rformat(template, spam="ham", bar="bar")["ham-ham"][0] == "foo-bar"
+
+
+def test_pattern_cache():
+    assert Pattern.from_string("foo-{bar}") is Pattern.from_string("foo-{bar}")
+    assert Pattern.from_string("foo-{{bar}}").fmt({}) == "foo-{bar}"
+
+
 @provide("echo.{name}")
 def echo(url):
     return url
@@ -0,0 +1,91 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+import pytest
+from interlinked import Workflow
+from interlinked.exceptions import LoopException
+
+LOGS = defaultdict(int)
+wkf = Workflow("test-parallel")
+barrier = Barrier(2, timeout=5)
+
+
+@wkf.provide("source.{name}")
+def source(name):
+    LOGS[name] += 1
+    return name
+
+
+@wkf.depend(value="source.{name}")
+@wkf.provide("left.{name}")
+def left(value):
+    # Only succeeds if right is running concurrently
+    barrier.wait()
+    return "left-" + value
+
+
+@wkf.depend(value="source.{name}")
+@wkf.provide("right.{name}")
+def right(value):
+    barrier.wait()
+    return "right-" + value
+
+
+@wkf.depend(left="left.{name}", right="right.{name}")
+@wkf.provide("join.{name}")
+def join(left, right, sep="+"):
+    return left + sep + right
+
+
+@wkf.provide("upper.{name}", "lower.{name}")
+def multi(name):
+    LOGS["multi"] += 1
+    return name.upper(), name.lower()
+
+
+@wkf.depend(upper="upper.{name}", lower="lower.{name}")
+@wkf.provide("upper-and-lower.{name}")
+def up_and_low(upper, lower):
+    return upper + lower
+
+
+def test_concurrent_branches():
+    with ThreadPoolExecutor(4) as pool:
+        res = wkf.run("join.ham", _executor=pool, sep="/")
+    assert res == "left-ham/right-ham"
+    # Diamond: source is only executed once
+    assert LOGS["ham"] == 1
+    LOGS.clear()
+
+
+def test_multi_provide():
+    with ThreadPoolExecutor(4) as pool:
+        res = wkf.run("upper-and-lower.Spam", "upper.spam", _executor=pool)
+    assert res == ("SPAMspam", "SPAM")
+    assert LOGS["multi"] == 2
+    LOGS.clear()
+
+
+def test_error():
+    loopy = Workflow("test-parallel-loopy")
+
+    @loopy.depend(value="second")
+    @loopy.provide("first")
+    def first(value):
+        return value
+
+    @loopy.depend(value="first")
+    @loopy.provide("second")
+    def second(value):
+        return value
+
+    @loopy.provide("fail")
+    def fail():
+        raise ValueError("fail")
+
+    with ThreadPoolExecutor(2) as pool:
+        with pytest.raises(LoopException):
+            loopy.run("first", _executor=pool)
+        with pytest.raises(ValueError):
+            loopy.run("fail", _executor=pool)
@@ -0,0 +1,65 @@
+import asyncio
+import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from interlinked import Workflow
+from interlinked.workflow import Plan
+
+LOGS = defaultdict(int)
+wkf = Workflow("test-plan", config={"scale.{name}": {"factor": 3}})
+
+
+@wkf.provide("low.{name}", "up.{name}")
+def variants(name):
+    LOGS[name] += 1
+    return name.lower(), name.upper()
+
+
+@wkf.depend(low="low.{name}", up="up.{name}")
+@wkf.provide("join.{name}")
+def join(low, up, sep="-"):
+    return low + sep + up
+
+
+@wkf.depend(value="join.{name}")
+@wkf.provide("scale.{name}")
+def scale(value, factor=1):
+    return value * factor
+
+
+def test_plan():
+    LOGS.clear()
+    plan = wkf.plan("scale.Ham", "join.Spam", sep="+")
+    # Nothing is executed
+    assert not LOGS
+    assert [step.resource_name for step in plan.order()] == [
+        "low.Ham",
+        "join.Ham",
+        "scale.Ham",
+        "low.Spam",
+        "join.Spam",
+    ]
+    expected = ("ham+HAM" * 3, "spam+SPAM")
+    assert plan.run() == expected
+    with ThreadPoolExecutor(2) as executor:
+        assert plan.run(_executor=executor) == expected
+    assert asyncio.run(plan.arun()) == expected
+    assert LOGS == {"Ham": 3, "Spam": 3}
+
+    explain = plan.explain()
+    assert "low.Ham <- variants (also provides up.Ham)" in explain
+    assert "    factor := 3" in explain
+
+
+def test_serialize():
+    plan = wkf.plan("scale.Ham")
+    data = json.loads(json.dumps(plan.to_dict()))
+    other = Plan.from_dict(data)
+    assert other.explain() == plan.explain()
+    assert other.run() == "ham-HAM" * 3
+
+    data["steps"][0]["route"] = "unknown"
+    with pytest.raises(KeyError):
+        Plan.from_dict(data)
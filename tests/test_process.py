@@ -0,0 +1,99 @@
+from glob import glob
+from time import sleep
+import os
+import textwrap
+
+import pytest
+from interlinked.exceptions import CellTimeout
+from interlinked.loader import load_source
+from interlinked.process import ProcessPool, receive, send
+
+SOURCE = """
+import os
+import time
+from interlinked import Workflow
+
+wkf = Workflow("test-process")
+
+
+@wkf.provide("pid.{name}")
+def pid(name):
+    return os.getpid()
+
+
+@wkf.provide("blob.{name}")
+def blob(name, size=10):
+    return name.encode() * size
+
+
+@wkf.depend(left="blob.{name}", right="pid.{name}")
+@wkf.provide("both.{name}")
+def both(left, right):
+    return len(left), right
+
+
+@wkf.depend(data="blob.{name}")
+@wkf.provide("length.{name}")
+def length(data):
+    return len(data)
+
+
+@wkf.provide("late", timeout=0.1)
+def late():
+    time.sleep(0.5)
+    return b"late" * 1000
+
+
+@wkf.provide("fail")
+def fail():
+    raise ValueError("fail")
+"""
+
+
+@pytest.fixture(scope="module")
+def source(tmp_path_factory):
+    path = tmp_path_factory.mktemp("process") / "process_flow.py"
+    path.write_text(textwrap.dedent(SOURCE))
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def wkf(source):
+    return load_source(source).wkf
+
+
+def test_process_pool(source, wkf):
+    with ProcessPool(source, max_workers=2, min_shared_bytes=100) as pool:
+        pids = wkf.run_many([f"pid.{i}" for i in range(4)], _executor=pool)
+        assert os.getpid() not in pids.values()
+
+        # Large result transferred through shared memory
+        assert wkf.run("blob.ham", size=1000, _executor=pool) == b"ham" * 1000
+        size, pid = wkf.run("both.spam", _executor=pool)
+        assert size == 40 and pid != os.getpid()
+
+        # Large input transferred through shared memory
+        assert wkf.run("length.ham", size=1000, _executor=pool) == 3000
+
+        with pytest.raises(ValueError, match="fail"):
+            wkf.run("fail", _executor=pool)
+
+
+def test_timeout(source, wkf):
+    segments = set(glob("/dev/shm/psm_*"))
+    with ProcessPool(source, max_workers=1, min_shared_bytes=100) as pool:
+        with pytest.raises(CellTimeout):
+            wkf.run("late", _executor=pool)
+        # The result sent after the timeout is released
+        for _ in range(50):
+            if set(glob("/dev/shm/psm_*")) == segments:
+                break
+            sleep(0.05)
+    assert set(glob("/dev/shm/psm_*")) == segments
+
+
+def test_shared_memory():
+    assert send(b"x" * 10, 100) == b"x" * 10
+    shared = send(b"x" * 1000, 100)
+    assert shared != b"x" * 1000
+    assert receive(shared) == b"x" * 1000
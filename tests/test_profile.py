@@ -0,0 +1,111 @@
+import sys
+import time
+
+import pytest
+from interlinked import Workflow
+from interlinked.profile import Hook, Profiler
+from interlinked.workflow import Run
+
+wkf = Workflow("test-profile")
+
+
+@wkf.provide("fast")
+def fast():
+    return b"x" * 100
+
+
+@wkf.provide("slow")
+def slow():
+    time.sleep(0.05)
+    return "slow"
+
+
+@wkf.depend(fast="fast", slow="slow")
+@wkf.provide("top")
+def top(fast, slow):
+    return len(fast)
+
+
+@wkf.depend(value="top", again="fast")
+@wkf.provide("fail")
+def fail(value, again):
+    raise ValueError("fail")
+
+
+class Events(Hook):
+    def __init__(self):
+        self.events = []
+
+    def on_start(self, run, step):
+        self.events.append(("start", step.resource_name))
+
+    def on_end(self, run, step, record):
+        self.events.append(("end", step.resource_name))
+
+    def on_error(self, run, step, exc):
+        self.events.append(("error", step.resource_name))
+
+
+def test_profiler():
+    profiler = Profiler()
+    events = Events()
+    profiled = wkf.clone()
+    profiled.add_hook(profiler)
+    profiled.add_hook(events)
+    assert not wkf.hooks
+
+    with pytest.raises(ValueError):
+        profiled.run("fail")
+    assert events.events == [
+        ("start", "fast"),
+        ("end", "fast"),
+        ("start", "slow"),
+        ("end", "slow"),
+        ("start", "top"),
+        ("end", "top"),
+        ("start", "fail"),
+        ("error", "fail"),
+    ]
+
+    records = {r.resource_name: r for r in profiler.records}
+    assert records["slow"].wall_time >= 0.05
+    assert records["slow"].cpu_time < 0.05
+    assert records["fast"].size == sys.getsizeof(b"x" * 100)
+    assert records["fast"].hits == 1
+    assert records["top"].dependencies == {"fast": "fast", "slow": "slow"}
+    assert isinstance(records["fail"].error, ValueError)
+
+    total, path = profiler.critical_path()
+    assert path == ["slow", "top", "fail"]
+    assert total >= 0.05
+
+    report = profiler.report()
+    assert report.splitlines()[1].startswith("slow ")
+    assert report.splitlines()[-2].startswith("Critical path")
+    assert report.splitlines()[-1] == f"Peak memory: {profiler.peak_memory} bytes"
+    assert profiler.peak_memory > 0
+
+
+def test_no_hooks():
+    # Nothing is measured without hooks
+    run = Run(wkf)
+    assert run.resolve_all(["top"]) == [100]
+    assert run.records == {}
+    assert run.sizes == {}
+
+
+def test_cpu_time_with_timeout():
+    busy = Workflow("test-profile-busy")
+
+    @busy.provide("busy", timeout=5)
+    def work():
+        start = time.thread_time()
+        while time.thread_time() - start < 0.05:
+            pass
+
+    profiler = Profiler()
+    busy.add_hook(profiler)
+    # Called in another thread, its cpu time is still measured
+    busy.run("busy", _timeout=30)
+    (record,) = profiler.records
+    assert record.cpu_time >= 0.05
@@ -1,4 +1,6 @@
 import datetime
+
+import pytest
 from interlinked.router import Router
 
 
@@ -132,3 +134,78 @@ def test_param_type():
         0,
         None
     )
+
+
+def test_first_match_wins():
+    router = Router()
+    router.add("{one}.x", 1)
+    router.add("b.{two}", 2)
+
+    # Both routes match, the first one added wins
+    match = router.match("b.x")
+    assert (match.value, match.kw) == (1, {"one": "b"})
+    match = router.match("b.y")
+    assert (match.value, match.kw) == (2, {"two": "y"})
+    # Routes are case insensitive
+    match = router.match("B.Y")
+    assert (match.value, match.kw) == (2, {"two": "Y"})
+
+    # The index is refreshed when a route is added
+    assert not router.match("c.z")
+    router.add("c.{three}", 3)
+    match = router.match("c.z")
+    assert (match.value, match.kw) == (3, {"three": "z"})
+
+
+def test_many_routes():
+    router = Router()
+    for i in range(500):
+        router.add(f"route_{i}.{{name}}", i)
+
+    for i in (0, 42, 499):
+        match = router.match(f"route_{i}.ham")
+        assert (match.route, match.value, match.kw) == (
+            f"route_{i}.{{name}}",
+            i,
+            {"name": "ham"},
+        )
+    assert not router.match("route_500.ham")
+
+
+def test_match_cache():
+    router = Router()
+    router.add("temperature_{city}", "temp")
+
+    match = router.match("temperature_brussels")
+    assert router.match("temperature_brussels") is match
+    assert router.match("unknown") is None
+    assert router.match("unknown") is None
+    info = router.cache_info()
+    assert (info.hits, info.misses) == (2, 2)
+
+    # Cached matches can not be modified
+    with pytest.raises(TypeError):
+        match.kw["city"] = "paris"
+    with pytest.raises(AttributeError):
+        match.route = "other"
+
+    # Cache is invalidated when a route is added
+    router.add("unknown", "new")
+    assert router.match("unknown").value == "new"
+    assert router.match("temperature_brussels") == match
+    assert router.cache_info().currsize == 2
+
+    # Clones share the index and the cache until they are modified
+    clone = router.clone()
+    assert clone.match("temperature_brussels") is router.match("temperature_brussels")
+    assert clone.table.index is router.table.index is not None
+    clone.add("temperature_paris", "paris")
+    assert clone.match("temperature_paris").value == "paris"
+    assert router.match("temperature_paris").value == "temp"
+    assert clone.table is not router.table
+
+    # Index built by a clone is shared with its parent
+    parent = Router(**{"rate_{ccy}": "rate"})
+    assert parent.clone().match("rate_usd").value == "rate"
+    assert parent.table.index is not None
+    assert parent.cache_info().currsize == 1
@@ -0,0 +1,104 @@
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from interlinked import Workflow
+from interlinked.workflow import Run
+
+CALLS = Counter()
+wkf = Workflow("test-run-cache")
+
+
+# Diamond: top -> left, right -> base
+@wkf.provide("base.{name}")
+def base(name):
+    CALLS["base"] += 1
+    return name
+
+
+@wkf.depend(value="base.{name}")
+@wkf.provide("left.{name}")
+def left(value):
+    CALLS["left"] += 1
+    return "l" + value
+
+
+@wkf.depend(value="base.{name}")
+@wkf.provide("right.{name}")
+def right(value):
+    CALLS["right"] += 1
+    return "r" + value
+
+
+@wkf.depend(left="left.{name}", right="right.{name}", upper="upper.{name}")
+@wkf.depend(lower="lower.{name}", nothing="nothing.{name}")
+@wkf.provide("top.{name}")
+def top(left, right, upper, lower, nothing):
+    CALLS["top"] += 1
+    assert nothing is None
+    return left + right + upper + lower
+
+
+# Multi-pattern cell
+@wkf.provide("upper.{name}", "lower.{name}")
+def multi(name):
+    CALLS["multi"] += 1
+    return name.upper(), name.lower()
+
+
+# Cell without return value, referenced twice
+@wkf.provide("nothing.{name}")
+def nothing(name):
+    CALLS["nothing"] += 1
+
+
+@wkf.depend(value="nothing.{name}", top="top.{name}")
+@wkf.provide("side-effect.{name}")
+def side_effect(value, top):
+    return value
+
+
+def run_sequential(name):
+    return wkf.run(name)
+
+
+def run_threaded(name):
+    with ThreadPoolExecutor(4) as pool:
+        return wkf.run(name, _executor=pool)
+
+
+def run_async(name):
+    return asyncio.run(wkf.arun(name))
+
+
+def run_many(name):
+    return wkf.run_many([name])[name]
+
+
+@pytest.mark.parametrize("runner", [run_sequential, run_threaded, run_async, run_many])
+def test_once_per_run(runner):
+    CALLS.clear()
+    assert runner("side-effect.ham") is None
+    assert CALLS == {
+        "base": 1,
+        "left": 1,
+        "right": 1,
+        "multi": 1,
+        "nothing": 1,
+        "top": 1,
+    }
+    # Distinct runs do not share results
+    runner("side-effect.ham")
+    assert set(CALLS.values()) == {2}
+
+
+def test_hits_and_misses():
+    run = Run(wkf)
+    assert run.resolve("top.ham") == "lhamrhamHAMham"
+    # base is read twice, lower is a sibling of upper
+    assert (run.hits, run.misses) == (2, 6)
+
+    run.resolve("nothing.ham")
+    run.resolve("top.ham")
+    assert (run.hits, run.misses) == (4, 6)
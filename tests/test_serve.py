@@ -0,0 +1,124 @@
+import json
+import subprocess
+import sys
+import threading
+from collections import defaultdict
+
+import pytest
+from interlinked import Workflow
+from interlinked.exceptions import RemoteError
+from interlinked.serve import Client, make_server
+
+LOGS = defaultdict(int)
+wkf = Workflow("test-serve")
+
+
+@wkf.provide("square.{value:int}")
+def square(value):
+    LOGS[value] += 1
+    return int(value) ** 2
+
+
+@wkf.depend(value="square.{value}")
+@wkf.provide("label.{value:int}")
+def label(value, prefix="v"):
+    return f"{prefix}{value}"
+
+
+@wkf.provide("fail")
+def fail():
+    raise ValueError("fail")
+
+
+@pytest.fixture(params=["tcp", "unix"])
+def client(request, tmp_path):
+    if request.param == "tcp":
+        server = make_server(wkf, "127.0.0.1:0")
+        address = "127.0.0.1:%s" % server.server_address[1]
+    else:
+        address = str(tmp_path / "interlinked.sock")
+        server = make_server(wkf, address)
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+    )
+    thread.start()
+    yield Client(address, timeout=5)
+    server.shutdown()
+    server.server_close()
+
+
+def test_serve(client):
+    LOGS.clear()
+    assert client.run("label.3") == "v9"
+    assert client.run("label.3", "square.4", prefix="w") == ("w9", 16)
+    # Results are kept between requests
+    assert LOGS == {"3": 1, "4": 1}
+
+    cfg = {"label.{value}": {"prefix": "c"}}
+    assert client.run_many(["label.2"], config=cfg) == {"label.2": "c4"}
+
+    with pytest.raises(RemoteError, match="ValueError: fail"):
+        client.run("fail")
+    with pytest.raises(RemoteError, match="reserved"):
+        client.run("label.3", _executor="x")
+
+
+def test_concurrent(client):
+    threads = [
+        threading.Thread(target=client.run, args=(f"label.{i}",)) for i in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.run_many([f"label.{i}" for i in range(10)]) == {
+        f"label.{i}": f"v{i * i}" for i in range(10)
+    }
+
+
+def test_invalid_request(client):
+    def post(body):
+        conn = client.connection()
+        try:
+            conn.request("POST", "/run", json.dumps(body))
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    for body in (
+        {"targets": "label.3"},
+        {"targets": [3]},
+        {"targets": ["label.3"], "config": ["label.{value}"]},
+        {"targets": ["label.3"], "kw": ["prefix"]},
+    ):
+        status, payload = post(body)
+        assert status == 400
+        assert payload["error"].startswith("Invalid request")
+
+
+def test_unix_address(tmp_path):
+    # Existing files are not replaced by the socket
+    path = tmp_path / "data.txt"
+    path.write_text("data")
+    with pytest.raises(FileExistsError):
+        make_server(wkf, str(path))
+    assert path.read_text() == "data"
+
+    # Sockets left by a previous server are
+    address = str(tmp_path / "interlinked.sock")
+    make_server(wkf, address).server_close()
+    server = make_server(wkf, address)
+    server.server_close()
+
+
+def test_cli_connect_options():
+    # Options of local runs are rejected with --connect
+    proc = subprocess.run(
+        [sys.executable, "-m", "interlinked", "flow", "run", "-p", "-j", "2"]
+        + ["--connect", "8765", "top"],
+        capture_output=True,
+        text=True,
+    )
+    assert proc.returncode == 2
+    assert "--profile, --processes can not be used with --connect" in proc.stderr
@@ -0,0 +1,97 @@
+from interlinked import Workflow
+
+
+def chains_workflow(name, nb_chains, length):
+    """
+    Independent chains of cells, all joined by cell "top". Only the
+    first cell of chain 0 consumes parameter p.
+    """
+    wkf = Workflow(name)
+    for chain in range(nb_chains):
+        if chain == 0:
+
+            @wkf.provide("c0_0")
+            def first(p=0):
+                return p
+
+        else:
+
+            @wkf.provide(f"c{chain}_0")
+            def first():
+                return 0
+
+        for i in range(1, length):
+
+            @wkf.depend(prev=f"c{chain}_{i - 1}")
+            @wkf.provide(f"c{chain}_{i}")
+            def step(prev):
+                return prev + 1
+
+    @wkf.depend(**{f"c{c}": f"c{c}_{length - 1}" for c in range(nb_chains)})
+    @wkf.provide("top")
+    def top(**kw):
+        return sum(kw[f"c{c}"] for c in range(nb_chains))
+
+    return wkf
+
+
+def test_incremental():
+    wkf = chains_workflow("test-session", 10, 50)
+    session = wkf.session()
+    assert session.run("top") == 490
+    assert session.misses == 501
+
+    # Nothing changed
+    assert session.run("top") == 490
+    assert session.misses == 501
+
+    # Only chain 0 consumes p
+    assert session.run("top", p=10) == 500
+    assert session.misses == 501 + 51
+
+    # Back to previous value
+    assert session.run("top") == 490
+    assert session.misses == 501 + 51 * 2
+
+
+def test_unused_parameter():
+    wkf = Workflow("test-session-unused")
+    calls = []
+
+    @wkf.provide("echo.{name}")
+    def echo(name, suffix=""):
+        calls.append(name)
+        return name + suffix
+
+    @wkf.depend(value="echo.{name}")
+    @wkf.provide("twice.{name}")
+    def twice(value):
+        return value * 2
+
+    session = wkf.session()
+    assert session.run("twice.ham", other=1) == "hamham"
+    assert session.run("twice.ham", other=2) == "hamham"
+    assert session.run("twice.ham", suffix="!") == "ham!ham!"
+    assert calls == ["ham", "ham"]
+
+    # Replace a cell
+    @wkf.provide("echo.{name}", _override=True)
+    def echo_upper(name):
+        return name.upper()
+
+    assert session.run("twice.ham") == "HAMHAM"
+
+    # Explicit invalidation
+    session.invalidate("echo.ham")
+    assert "twice.ham" not in session.cache
+    assert session.run("twice.ham") == "HAMHAM"
+
+
+def test_deep_chain():
+    wkf = chains_workflow("test-session-deep-chain", 1, 3000)
+    session = wkf.session()
+    assert session.run("top") == 2999
+    assert session.run("top") == 2999
+    assert session.misses == 3001
+    assert session.run("top", p=1) == 3000
+    assert session.misses == 2 * 3001
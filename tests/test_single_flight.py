@@ -0,0 +1,131 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier, Event, Timer
+from time import perf_counter, sleep
+
+import pytest
+
+from interlinked import Workflow
+from interlinked.exceptions import RunCancelled, RunTimeout
+from interlinked.workflow import Run
+
+
+def slow_workflow(name, single_flight):
+    wkf = Workflow(name, single_flight=single_flight)
+    calls = []
+
+    @wkf.provide("slow.{key}")
+    def slow(key):
+        calls.append(key)
+        sleep(0.2)
+        return key.upper()
+
+    @wkf.depend(value="slow.{key}")
+    @wkf.provide("top.{key}")
+    def top(value):
+        return value + "!"
+
+    return wkf, calls
+
+
+@pytest.mark.parametrize("single_flight", [True, False])
+def test_concurrent_runs(single_flight):
+    wkf, calls = slow_workflow(f"test-single-flight-{single_flight}", single_flight)
+
+    def run_all(keys):
+        barrier = Barrier(len(keys))
+
+        def run(key):
+            barrier.wait()
+            return wkf.run(f"top.{key}")
+
+        with ThreadPoolExecutor(len(keys)) as pool:
+            return list(pool.map(run, keys))
+
+    results = run_all(["ham"] * 8)
+    assert results == ["HAM!"] * 8
+    if single_flight:
+        assert calls == ["ham"]
+        assert wkf.flights.shared == 7
+        assert wkf.flights.calls == {}
+    else:
+        assert calls == ["ham"] * 8
+
+    # Different parameters are not coalesced
+    calls.clear()
+    results = run_all(["ham", "spam"])
+    assert results == ["HAM!", "SPAM!"]
+    assert sorted(calls) == ["ham", "spam"]
+
+    # Flights are not cached
+    calls.clear()
+    wkf.run("top.ham")
+    assert calls == ["ham"]
+
+
+def test_error():
+    wkf = Workflow("test-single-flight-error", single_flight=True)
+    started = Event()
+
+    @wkf.provide("fail")
+    def fail():
+        started.set()
+        sleep(0.2)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(wkf.run, "fail")
+        started.wait()
+        second = pool.submit(wkf.run, "fail")
+        for future in (first, second):
+            with pytest.raises(ValueError, match="boom"):
+                future.result()
+    assert wkf.flights.calls == {}
+
+
+def test_async():
+    wkf = Workflow("test-single-flight-async", single_flight=True)
+    calls = []
+
+    @wkf.provide("slow.{key}")
+    async def slow(key):
+        calls.append(key)
+        await asyncio.sleep(0.1)
+        return key.upper()
+
+    async def main():
+        return await asyncio.gather(
+            wkf.arun("slow.ham"), wkf.arun("slow.ham"), wkf.arun("slow.spam")
+        )
+
+    assert asyncio.run(main()) == ["HAM", "HAM", "SPAM"]
+    assert sorted(calls) == ["ham", "spam"]
+
+
+def test_bounded_wait():
+    wkf = Workflow("test-single-flight-bounded", single_flight=True)
+    started = Event()
+
+    @wkf.provide("slow")
+    def slow():
+        started.set()
+        sleep(1)
+        return "done"
+
+    with ThreadPoolExecutor(1) as pool:
+        leader = pool.submit(wkf.run, "slow")
+        started.wait()
+
+        # Joined calls are bounded by the deadline of the run
+        start = perf_counter()
+        with pytest.raises(RunTimeout):
+            wkf.run("slow", _timeout=0.2)
+        assert perf_counter() - start < 0.5
+
+        # And by its cancellation
+        run = Run(wkf)
+        Timer(0.1, run.cancel).start()
+        with pytest.raises(RunCancelled):
+            run.resolve_all(["slow"])
+        assert perf_counter() - start < 0.8
+        assert leader.result() == "done"
@@ -0,0 +1,91 @@
+import json
+import pickle
+import subprocess
+import sys
+
+import interlinked
+from interlinked.loader import cached_metadata, load_source
+
+# Modules that must not be loaded by the cli before they are needed
+LAZY_MODULES = [
+    "asyncio",
+    "http.server",
+    "importlib.metadata",
+    "interlinked.process",
+    "interlinked.serve",
+    "multiprocessing",
+    "rich",
+]
+
+
+def import_times(statement):
+    """
+    Return {module: cumulative import time in us} for the given statement
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_time():
+    times = import_times("import interlinked.cli")
+    assert "interlinked.workflow" in times
+    for module in LAZY_MODULES:
+        assert module not in times, f"{module} imported at startup"
+
+    times = import_times("import interlinked")
+    assert "interlinked.workflow" not in times
+
+
+def test_lazy_attributes():
+    assert interlinked.Workflow.__name__ == "Workflow"
+    assert isinstance(interlinked.__version__, str)
+    assert "provide" in dir(interlinked)
+
+
+def test_cached_metadata(tmp_path):
+    source = tmp_path / "flow.py"
+    source.write_text("# v1")
+    calls = []
+
+    def compute():
+        calls.append(source.read_text())
+        return {"deps": {"a": []}, "error": None}
+
+    cache_dir = str(tmp_path / "cache")
+    for _ in range(2):
+        meta = cached_metadata(cache_dir, str(source), compute)
+        assert meta == {"deps": {"a": []}, "error": None}
+    assert calls == ["# v1"]
+
+    source.write_text("# v2")
+    cached_metadata(cache_dir, str(source), compute)
+    assert calls == ["# v1", "# v2"]
+
+    # No cache directory
+    cached_metadata(None, str(source), compute)
+    assert len(calls) == 3
+
+
+def test_load_source(tmp_path):
+    source = tmp_path / "json.py"
+    source.write_text(
+        "from dataclasses import dataclass\n\n"
+        "@dataclass\n"
+        "class Point:\n"
+        "    x: int\n"
+    )
+    module = load_source(str(source))
+    # Modules named like the source file are not replaced
+    assert sys.modules["json"] is json
+    assert pickle.loads(pickle.dumps(module.Point(1))) == module.Point(1)
@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pytest
+from interlinked import Workflow
+from interlinked.exceptions import StreamConsumed
+from interlinked.profile import Profiler
+from interlinked.stream import Stream
+
+LOGS = {"produced": 0, "ahead": 0, "calls": 0}
+wkf = Workflow("test-stream")
+
+
+@wkf.provide("rows.{name}", buffer=2)
+def rows(size=10):
+    LOGS["calls"] += 1
+    for i in range(size):
+        LOGS["produced"] += 1
+        yield i
+
+
+@wkf.depend(row="rows.{name}")
+@wkf.provide("square.{name}", chunked=True, buffer=2)
+def square(row, offset=0):
+    return row * row + offset
+
+
+@wkf.depend(squares="square.{name}")
+@wkf.provide("total.{name}")
+def total(squares):
+    res = 0
+    for value in squares:
+        # Chunks produced but not yet consumed
+        LOGS["ahead"] = max(LOGS["ahead"], LOGS["produced"] - value**0.5 - 1)
+        time.sleep(0.001)
+        res += value
+    return res
+
+
+@wkf.depend(left="rows.{name}", right="square.{name}")
+@wkf.provide("pairs.{name}")
+def pairs(left, right):
+    return list(zip(left, right))
+
+
+def test_stream():
+    stream = wkf.run("square.ham", size=3)
+    assert isinstance(stream, Stream)
+    assert list(stream) == [0, 1, 4]
+    # A stream can only be iterated once
+    with pytest.raises(StreamConsumed):
+        list(stream)
+
+    assert wkf.run("total.ham", size=4, offset=1) == 18
+
+
+def test_single_producer():
+    LOGS["calls"] = 0
+    profiler = Profiler()
+    profiled = wkf.clone()
+    profiled.add_hook(profiler)
+    assert profiled.run("total.ham", size=4) == 14
+    assert LOGS["calls"] == 1
+    # Production is measured
+    records = {r.resource_name: r for r in profiler.records}
+    assert records["rows.ham"].wall_time >= 0.004
+
+    # rows is consumed by pairs and by square: it is not produced twice
+    with pytest.raises(StreamConsumed):
+        wkf.run("pairs.ham", size=3)
+    assert LOGS["calls"] == 2
+
+
+def test_backpressure():
+    LOGS.update(produced=0, ahead=0)
+    with ThreadPoolExecutor(2) as executor:
+        res = wkf.run("total.ham", size=100, _executor=executor)
+    assert res == sum(i * i for i in range(100))
+    assert LOGS["produced"] == 100
+    # Buffers of rows and square, plus the chunk held by each stage
+    assert LOGS["ahead"] <= 2 + 2 + 3
+
+
+def test_error():
+    @wkf.provide("broken")
+    def broken():
+        yield 1
+        raise ValueError("broken")
+
+    @wkf.depend(values="broken")
+    @wkf.provide("consume-broken")
+    def consume(values):
+        return list(values)
+
+    with ThreadPoolExecutor(2) as executor:
+        with pytest.raises(ValueError, match="broken"):
+            wkf.run("consume-broken", _executor=executor)
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+
+        @wkf.provide("invalid", batch=True)
+        def invalid():
+            yield 1
+
+    with pytest.raises(ValueError):
+
+        @wkf.provide("invalid-timeout", timeout=1)
+        def invalid_timeout():
+            yield 1
+
+    @wkf.provide("not-a-stream")
+    def not_a_stream():
+        return 1
+
+    @wkf.depend(value="not-a-stream")
+    @wkf.provide("invalid-chunked", chunked=True)
+    def invalid_chunked(value):
+        return value
+
+    with pytest.raises(ValueError):
+        wkf.run("invalid-chunked")
@@ -0,0 +1,207 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from threading import Event, Timer
+from time import perf_counter, sleep
+import asyncio
+
+import pytest
+
+from interlinked import Workflow
+from interlinked.exceptions import CellTimeout, RunCancelled, RunTimeout
+
+
+def test_retries():
+    wkf = Workflow("test-timeout-retries")
+    calls = defaultdict(int)
+
+    @wkf.provide("flaky.{retries}", retries=2, backoff=0.01)
+    def flaky(retries):
+        calls[retries] += 1
+        if calls[retries] <= int(retries):
+            raise ConnectionError("try again")
+        return calls[retries]
+
+    assert wkf.run("flaky.2") == 3
+    with pytest.raises(ConnectionError):
+        wkf.run("flaky.3")
+    assert calls["3"] == 3
+
+
+def test_cell_timeout():
+    wkf = Workflow("test-timeout-cell")
+    calls = []
+
+    @wkf.provide("fetch", timeout=0.1, retries=1)
+    def fetch():
+        calls.append(None)
+        if len(calls) == 1:
+            # Hung on first call
+            sleep(1)
+        return "ok"
+
+    @wkf.provide("hung", timeout=0.1)
+    def hung():
+        sleep(1)
+
+    start = perf_counter()
+    assert wkf.run("fetch") == "ok"
+    with pytest.raises(CellTimeout):
+        wkf.run("hung")
+    assert perf_counter() - start < 0.5
+
+    # Errors raised by the cell are not timeouts
+    @wkf.provide("fail", timeout=1)
+    def fail():
+        raise TimeoutError("from the cell")
+
+    with pytest.raises(TimeoutError, match="from the cell"):
+        wkf.run("fail")
+
+
+def chain_workflow(name, length, delay):
+    wkf = Workflow(name)
+    calls = []
+
+    @wkf.provide("c0")
+    def first():
+        calls.append("c0")
+        sleep(delay)
+        return 0
+
+    for i in range(1, length):
+
+        @wkf.depend(prev=f"c{i - 1}")
+        @wkf.provide(f"c{i}")
+        def step(prev, i=i):
+            calls.append(f"c{i}")
+            sleep(delay)
+            return prev + 1
+
+    return wkf, calls
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_run_timeout(concurrent):
+    wkf, calls = chain_workflow(f"test-timeout-run-{concurrent}", 10, 0.05)
+    executor = ThreadPoolExecutor(2) if concurrent else None
+    start = perf_counter()
+    with pytest.raises(RunTimeout):
+        wkf.run("c9", _timeout=0.12, _executor=executor)
+    assert perf_counter() - start < 0.3
+    assert len(calls) < 5
+    if executor:
+        executor.shutdown()
+
+    assert wkf.run("c9", _timeout=5) == 9
+
+
+def test_cancel():
+    wkf, calls = chain_workflow("test-timeout-cancel", 5, 0)
+    session = wkf.session()
+
+    @wkf.depend(prev="c2")
+    @wkf.provide("c3", _override=True)
+    def cancel(prev):
+        calls.append("c3")
+        session.cancel()
+        return prev + 1
+
+    with pytest.raises(RunCancelled):
+        session.run("c4")
+    assert calls == ["c0", "c1", "c2", "c3"]
+
+    # Completed results are reused
+    assert session.run("c4") == 4
+    assert calls == ["c0", "c1", "c2", "c3", "c4"]
+
+
+def test_async_timeout():
+    wkf = Workflow("test-timeout-async")
+    calls = []
+
+    @wkf.provide("fetch", timeout=0.1, retries=1)
+    async def fetch():
+        calls.append(None)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        return "ok"
+
+    @wkf.provide("hung", timeout=0.1)
+    async def hung():
+        await asyncio.sleep(1)
+
+    start = perf_counter()
+    assert asyncio.run(wkf.arun("fetch")) == "ok"
+    with pytest.raises(CellTimeout):
+        asyncio.run(wkf.arun("hung"))
+    assert perf_counter() - start < 0.5
+
+
+def test_cancel_event():
+    wkf, calls = chain_workflow("test-timeout-cancel-event", 10, 0.05)
+    cancel = Event()
+    Timer(0.12, cancel.set).start()
+    with pytest.raises(RunCancelled):
+        wkf.run("c9", _cancel=cancel)
+    assert len(calls) < 5
+
+    async def main():
+        cancel = Event()
+        asyncio.get_running_loop().call_later(0.12, cancel.set)
+        return await wkf.arun("c9", _cancel=cancel)
+
+    calls.clear()
+    with pytest.raises(RunCancelled):
+        asyncio.run(main())
+    assert len(calls) < 5
+
+
+def hung_workflow(name):
+    wkf = Workflow(name)
+
+    # No timeout of its own
+    @wkf.provide("hung")
+    def hung():
+        sleep(2)
+        return 1
+
+    @wkf.depend(value="hung")
+    @wkf.provide("top")
+    def top(value):
+        return value
+
+    @wkf.provide("ahung")
+    async def ahung():
+        await asyncio.sleep(2)
+        return 1
+
+    return wkf
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_hung_cell(concurrent):
+    wkf = hung_workflow(f"test-timeout-hung-{concurrent}")
+    executor = ThreadPoolExecutor(2) if concurrent else None
+
+    start = perf_counter()
+    with pytest.raises(RunTimeout):
+        wkf.run("top", _timeout=0.2, _executor=executor)
+    assert perf_counter() - start < 0.5
+
+    start = perf_counter()
+    cancel = Event()
+    Timer(0.2, cancel.set).start()
+    with pytest.raises(RunCancelled):
+        wkf.run("top", _cancel=cancel, _executor=executor)
+    assert perf_counter() - start < 0.5
+    if executor:
+        executor.shutdown(wait=False)
+
+
+def test_async_hung_cell():
+    wkf = hung_workflow("test-timeout-async-hung")
+    for name in ("top", "ahung"):
+        start = perf_counter()
+        with pytest.raises(RunTimeout):
+            asyncio.run(wkf.arun(name, _timeout=0.2))
+        assert perf_counter() - start < 0.5
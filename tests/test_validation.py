@@ -1,5 +1,5 @@
 import pytest
-from interlinked import depend, provide, default_workflow
+from interlinked import depend, provide, default_workflow, Workflow
 from interlinked.exceptions import LoopException
 
 
@@ -49,8 +49,8 @@ def test_direct_loop():
 def test_indirect_loop():
     wkf = default_workflow.clone(name="test-2")
     # Add new links D -> E -> A
-    wkf.depend(d="d")
-    wkf.provide("e")
+    @wkf.depend(d="d")
+    @wkf.provide("e")
     def fn_e(d):
         pass
 
@@ -61,3 +61,53 @@ def test_indirect_loop():
 
 
 
+def layered_workflow(name, layers, width):
+    wkf = Workflow(name)
+    for layer in range(layers):
+        for pos in range(width):
+            deps = {}
+            if layer:
+                deps = {
+                    "left": f"node_{layer - 1}_{pos}",
+                    "right": f"node_{layer - 1}_{(pos + 1) % width}",
+                }
+
+            @wkf.depend(**deps)
+            @wkf.provide(f"node_{layer}_{pos}")
+            def node(**kw):
+                return len(kw)
+
+    return wkf
+
+
+def test_large_dag():
+    # Number of paths grows exponentially with the number of layers
+    wkf = layered_workflow("test-large-dag", 100, 20)
+    wkf.validate()
+    graph = wkf.graph()
+    assert len(graph.order) == 2000
+    assert graph.order.index("node_0_0") < graph.order.index("node_1_0")
+
+    # The cached graph is not exposed
+    deps = wkf.deps()
+    deps["node_0_0"].append("node_0_0")
+    deps.clear()
+    wkf.validate()
+    assert wkf.deps()["node_0_0"] == ["node_1_0", "node_1_19"]
+
+    # Graph is cached until the workflow is modified
+    assert wkf.graph() is graph
+
+    @wkf.depend(value="node_99_0")
+    @wkf.provide("node_0_5", _override=True)
+    def loop(value):
+        pass
+
+    assert wkf.graph() is not graph
+    with pytest.raises(LoopException):
+        wkf.validate()
+
+
+def test_deep_chain():
+    wkf = layered_workflow("test-deep-chain", 2000, 1)
+    wkf.validate()
@@ -2,6 +2,7 @@ from collections import defaultdict
 
 import pytest
 from interlinked import Workflow
+from interlinked.exceptions import LoopException
 
 LOGS = defaultdict(int)
 wkf = Workflow("test-wkf")
@@ -124,3 +125,114 @@ def test_provide_override():
         return "override"
 
     assert wkf.run("echo") == "override"
+
+
+def test_clone():
+    registry_size = len(Workflow._registry)
+    for i in range(100):
+        assert wkf.kw(name="test", repeat=i).run("many_echo") == " ".join(["test"] * i)
+    # Anonymous clones are not registered
+    assert len(Workflow._registry) == registry_size
+
+    clone = wkf.clone(name="test-wkf-clone")
+    assert Workflow.get("test-wkf-clone") is clone
+    assert clone.router.routes is wkf.router.routes
+
+    # Routes are copied on write, in both directions
+    @clone.provide("clone-only")
+    def clone_only():
+        return "clone"
+
+    @wkf.provide("parent-only")
+    def parent_only():
+        return "parent"
+
+    assert clone.run("clone-only") == "clone"
+    assert "clone-only" not in wkf.router
+    assert "parent-only" not in clone.router
+
+
+def test_clone_depend():
+    parent = Workflow("test-clone-depend")
+
+    @parent.provide("base")
+    def base():
+        return 1
+
+    @parent.provide("other")
+    def other():
+        return 2
+
+    @parent.provide("top")
+    def top(value=0):
+        return value
+
+    parent.validate()
+    clone = parent.clone()
+
+    # Cells are copied on write, in both directions
+    clone.depend(value="other")(top)
+    parent.depend(value="base")(top)
+    parent.mutate(value=lambda value: value * 10)(top)
+    assert clone.run("top") == 2
+    assert parent.run("top") == 10
+    assert parent.deps() == {"base": ["top"], "other": [], "top": []}
+    assert clone.deps() == {"base": [], "other": ["top"], "top": []}
+
+
+def test_clone_config():
+    parent = Workflow("test-clone-config", config={"echo": {"name": "from conf"}})
+    parent.provide("echo")(echo)
+
+    assert parent.kw(repeat=2).run("echo") == "from conf"
+    assert parent.clone().run("echo") == "from conf"
+    assert parent.config({"echo": {"name": "other"}}).run("echo") == "other"
+
+
+def test_deep_chain():
+    wkf = Workflow("test-run-deep-chain")
+
+    @wkf.provide("day_0")
+    def first():
+        return 0
+
+    # Way above the default recursion limit
+    size = 5000
+    for i in range(1, size):
+
+        @wkf.depend(prev=f"day_{i - 1}")
+        @wkf.provide(f"day_{i}")
+        def day(prev):
+            return prev + 1
+
+    assert wkf.run(f"day_{size - 1}") == size - 1
+
+
+def test_error_path():
+    wkf = Workflow("test-error-path")
+
+    @wkf.provide("broken")
+    def broken():
+        raise ValueError("broken")
+
+    @wkf.depend(value="broken")
+    @wkf.provide("middle")
+    def middle(value):
+        return value
+
+    @wkf.depend(value="middle")
+    @wkf.provide("top")
+    def top(value):
+        return value
+
+    with pytest.raises(ValueError) as exc_info:
+        wkf.run("top")
+    assert exc_info.value.__notes__ == ["Dependency path: top -> middle -> broken"]
+
+    @wkf.depend(value="top")
+    @wkf.provide("broken", _override=True)
+    def loop(value):
+        return value
+
+    with pytest.raises(LoopException):
+        wkf.run("top")